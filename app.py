@@ -1,45 +1,358 @@
 import os
 import io
-import base64
+import heapq
+import math
 import requests
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import matplotlib.image as mimage
+import numpy as np
 import pytz
-from datetime import datetime, timedelta, time
-from flask import Flask, render_template
+from collections import namedtuple
+from datetime import date, datetime, timedelta, time, timezone
+from flask import (Flask, Response, render_template, jsonify, request, redirect, url_for, make_response,
+                   stream_with_context)
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from collections import defaultdict
+from matplotlib.figure import Figure
+from itertools import islice
+from time import perf_counter, sleep
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from http_pool import charge_retries, get_session, pool_stats, reset_session
+from forecast_cache import ForecastCache, Loaded
+from forecast_store import ForecastStore
+from shared_cache import SharedCacheMiss, SharedCounters, SharedForecasts, SharedSlot, WriterLock
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from rate_limit import RateLimiter, RateLimitedError, RefreshScheduler
+from registry import LocationRegistry, DEFAULT_PATH as DEFAULT_LOCATIONS_FILE
+from spatial import GridIndex
+from singleflight import SingleFlight
+from prerender import PrerenderScheduler, make_artifact
+from panel_cache import RasterCache, series_key
+from columnar import MIN_ALPHA, MAX_ALPHA, batch_alpha, daily_groups, local_day_hour, parse_forecast_columns
+from archive import ForecastArchive
+from export import ENCODERS, FORMATS
 
 app = Flask(__name__)
 
-FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+FORECAST_URL = os.getenv("FORECAST_URL", "http://api.openweathermap.org/data/2.5/forecast")
+
+# Crag list; see registry.py for the file format
+LOCATION_REGISTRY = LocationRegistry(os.getenv("LOCATIONS_FILE", DEFAULT_LOCATIONS_FILE))
+
+
+# Nearby queries score at most this many of the closest crags per request,
+# searching at most this far out. Only already cached forecasts are scored;
+# the rest are queued for the refresh scheduler, never fetched on the request path
+NEARBY_MAX_CANDIDATES = int(os.getenv("NEARBY_MAX_CANDIDATES", "100"))
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "500"))
+
+
+# The unselected dashboard shows these regions (comma separated, empty for
+# all of them), and no dashboard draws more than DASHBOARD_MAX_LOCATIONS
+# panels; the rest of the registry is only reachable through a selection
+DASHBOARD_REGIONS = [r.strip() for r in os.getenv("DASHBOARD_REGIONS", "").split(",") if r.strip()] or None
+DASHBOARD_MAX_LOCATIONS = int(os.getenv("DASHBOARD_MAX_LOCATIONS", "24"))
+
+
+def all_locations():
+    return LOCATION_REGISTRY.select()
+
+
+def capped(locations):
+    return dict(islice(locations.items(), DASHBOARD_MAX_LOCATIONS))
+
+
+def default_locations():
+    return capped(LOCATION_REGISTRY.select(regions=DASHBOARD_REGIONS))
+
+
+_spatial_index = None
+_spatial_index_lock = threading.Lock()
+
+
+def spatial_index():
+    global _spatial_index
+    with _spatial_index_lock:
+        if _spatial_index is None:
+            _spatial_index = GridIndex((loc.id, loc.lat, loc.lon)
+                                       for loc in LOCATION_REGISTRY.load().values())
+        return _spatial_index
 
-LOCATIONS = {
-    "Farley": {"lat": 42.5949, "lon": -72.3678},
-    "Rumney": {"lat": 43.9426, "lon": -71.8224},
-    "Merriam Woods": {"lat": 43.9948, "lon": -71.6828},
-    "The Gunks": {"lat": 41.7459, "lon": -74.0890},
-    "Hanging Mountain": {"lat": 42.0618, "lon": -73.1150},
-    "Pawtuckaway": {"lat": 43.0311, "lon": -71.1475},
-    "Cathedral Ledge": {"lat": 44.0619, "lon": -71.1237},
-}
 
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
+# Upper bound on simultaneous OpenWeatherMap requests per dashboard render
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+
+# Per-request (connect, read) timeouts, and the overall budget a page render
+# may spend waiting on upstream before falling back to cached data
+FETCH_TIMEOUT = (float(os.getenv("FETCH_CONNECT_TIMEOUT", "3.05")),
+                 float(os.getenv("FETCH_READ_TIMEOUT", "10")))
+RENDER_DEADLINE = float(os.getenv("RENDER_DEADLINE", "15"))
+
+# Consecutive upstream failures before we stop calling OpenWeatherMap, and
+# how long to serve cached data before probing it again
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "60"))
+
+# OpenWeatherMap free tier limits; upstream calls beyond them wait up to
+# QUOTA_WAIT seconds for a token and then fail over to cached data
+QUOTA_PER_MINUTE = int(os.getenv("QUOTA_PER_MINUTE", "50"))
+QUOTA_PER_DAY = int(os.getenv("QUOTA_PER_DAY", "25000"))
+QUOTA_WAIT = float(os.getenv("QUOTA_WAIT", "2"))
+REFRESH_SCHEDULER_ENABLED = os.getenv("REFRESH_SCHEDULER_ENABLED", "1") == "1"
+
+# Snap coordinates to a grid of this many degrees before fetching, so nearby
+# crags share one upstream call and one parsed series; 0 disables snapping
+GRID_SNAP_DEGREES = float(os.getenv("GRID_SNAP_DEGREES", "0"))
+
+# The 5 day / 3 hour forecast product only changes every few hours
+FORECAST_TTL = int(os.getenv("FORECAST_TTL", "1800"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "512"))
+# Directory of the append-only forecast history; empty disables archiving
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "forecast_archive")
+# Locations fetched and scored at a time by the streaming export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "16"))
+# Dashboards for ?ids=/?regions= selections, cached per distinct selection
+SELECTION_CACHE_SIZE = int(os.getenv("SELECTION_CACHE_SIZE", "64"))
+SELECTION_TTL = int(os.getenv("SELECTION_TTL", str(FORECAST_TTL)))
+UNITS = "metric"
+# SQLite file the forecast cache persists to across restarts; empty disables
+FORECAST_STORE = os.getenv("FORECAST_STORE", "forecast_store.sqlite3")
+
+# Background dashboard renders, aligned to the 3 hourly forecast updates
+PRERENDER_ENABLED = os.getenv("PRERENDER_ENABLED", "1") == "1"
+PRERENDER_INTERVAL = int(os.getenv("PRERENDER_INTERVAL", str(3 * 3600)))
+PRERENDER_OFFSET = int(os.getenv("PRERENDER_OFFSET", "600"))
+
+# Directory for the memory-mapped cache shared by all workers on this host.
+# One worker holds the writer lock, fetches and renders; the rest read.
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", "")
+SHARED_FORECAST_SHARDS = int(os.getenv("SHARED_FORECAST_SHARDS", "64"))
+SHARED_FORECAST_ENTRIES = int(os.getenv("SHARED_FORECAST_ENTRIES", "4096"))
+# How long a reader waits for the writer to publish a missing forecast
+SHARED_WAIT = float(os.getenv("SHARED_WAIT", "2"))
+SHARED_POLL = 0.25
+
+# "panels" composites per-location cached rasters, "figure" draws one figure
+RENDER_MODE = os.getenv("RENDER_MODE", "panels")
+PANEL_CACHE_SIZE = int(os.getenv("PANEL_CACHE_SIZE", "32"))
+# Worker processes for drawing panels in parallel; 0 draws in-process
+PANEL_RENDER_PROCESSES = int(os.getenv("PANEL_RENDER_PROCESSES", "0"))
+PANEL_DPI = 100
+PANEL_WIDTH = 12
+# Fixed margins (inches) keep every panel's axes aligned when stacked
+PANEL_AXES_HEIGHT = 2.3
+PANEL_TOP_MARGIN = 0.4
+PANEL_BOTTOM_MARGIN = 0.3
+PANEL_XAXIS_MARGIN = 0.75
+PANEL_LEFT = 0.07
+PANEL_RIGHT = 0.93
+
 eastern = pytz.timezone('America/New_York')
 
-def fetch_forecast_by_coords(lat, lon):
+def fetch_forecast_by_coords(lat, lon, units=UNITS):
     params = {
         "lat": lat,
         "lon": lon,
         "appid": API_KEY,
-        "units": "metric",
+        "units": units,
     }
-    resp = requests.get(FORECAST_URL, params=params)
+    resp = get_session().get(FORECAST_URL, params=params, timeout=FETCH_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
 
+def _upstream_failure(exc):
+    # Only outages and throttling count; a 4xx for one request is our problem
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, requests.RequestException)
+
+
+owm_breaker = CircuitBreaker("openweathermap", failure_threshold=BREAKER_THRESHOLD,
+                             reset_timeout=BREAKER_RESET, is_failure=_upstream_failure)
+
+# Shared through SHARED_CACHE_DIR, so the quota holds for the whole host
+owm_limiter = RateLimiter(QUOTA_PER_MINUTE, QUOTA_PER_DAY,
+                          state_path=os.path.join(SHARED_CACHE_DIR, "quota.state") if SHARED_CACHE_DIR else None)
+# urllib3 retries are upstream calls too
+charge_retries(lambda: owm_limiter.try_acquire())
+
+fetch_flight = SingleFlight()
+render_flight = SingleFlight()
+
+
+if SHARED_CACHE_DIR:
+    os.makedirs(SHARED_CACHE_DIR, exist_ok=True)
+    shared_writer = WriterLock(os.path.join(SHARED_CACHE_DIR, "writer.lock"))
+    shared_forecasts = SharedForecasts(
+        [SharedSlot(os.path.join(SHARED_CACHE_DIR, f"forecasts-{i:02d}.mmap"), 256 << 10)
+         for i in range(SHARED_FORECAST_SHARDS)],
+        max_entries=SHARED_FORECAST_ENTRIES)
+    shared_dashboard = SharedSlot(os.path.join(SHARED_CACHE_DIR, "dashboard.mmap"), 2 << 20)
+    # Views and misses from every worker, for the writer's refresh scheduler
+    shared_counts = SharedCounters(os.path.join(SHARED_CACHE_DIR, "scheduler.counts"))
+else:
+    shared_writer = shared_forecasts = shared_dashboard = shared_counts = None
+
+
+forecast_archive = ForecastArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+
+
+def _archive_forecast(lat, lon, fetched_at, data):
+    try:
+        forecast_archive.append(lat, lon, fetched_at, parse_forecast_columns(data, eastern))
+    except Exception as e:
+        print(f"Archiving forecast for {lat},{lon} failed: {e}")
+
+
+def _fetch_within_quota(lat, lon, units):
+    # Runs inside the breaker, so short-circuited calls never spend quota
+    owm_limiter.acquire(timeout=QUOTA_WAIT)
+    return fetch_forecast_by_coords(lat, lon, units)
+
+
+def is_writer():
+    # The one process that calls upstream, refreshes and pre-renders
+    return shared_writer is None or shared_writer.try_acquire()
+
+
+def _read_shared(key):
+    # Readers never call upstream: wait briefly for the writer to publish a
+    # fresh forecast, then make do with a stale one. Returns the writer's
+    # (fetched_at, value), so a stale copy stays stale here too.
+    deadline = perf_counter() + SHARED_WAIT
+    missed = False
+    while True:
+        entry = shared_forecasts.get(key)
+        now = datetime.now(timezone.utc).timestamp()
+        if entry is not None and now - entry[0] < FORECAST_TTL:
+            return entry
+        if not missed:
+            # Moves the key to the front of the writer's refresh queue
+            refresh_scheduler.record_miss(key)
+            missed = True
+        if perf_counter() >= deadline:
+            break
+        sleep(SHARED_POLL)
+    if entry is not None:
+        return entry
+    raise SharedCacheMiss(f"no shared forecast for {key} yet")
+
+
+def _fetch_or_share(lat, lon, units):
+    key = (lat, lon, units)
+    now = datetime.now(timezone.utc).timestamp()
+    if not is_writer():
+        # Only the process that fetched a forecast writes it to the store
+        fetched_at, data = _read_shared(key)
+        return Loaded(fetched_at, data, persist=False)
+    # Raises CircuitOpenError while the breaker is open, or RateLimitedError
+    # after waiting up to QUOTA_WAIT for quota; callers then keep serving
+    # whatever the cache or store already has
+    data = owm_breaker.call(_fetch_within_quota, lat, lon, units)
+    if shared_forecasts is not None and shared_writer.held:
+        shared_forecasts.put(key, now, data)
+    if forecast_archive is not None:
+        _archive_forecast(lat, lon, now, data)
+    return data
+
+
+def _load_forecast(lat, lon, units):
+    # Cache misses and background refreshes for the same key share one request
+    return fetch_flight.do((lat, lon, units), _fetch_or_share, lat, lon, units)
+
+
+forecast_store = ForecastStore(FORECAST_STORE) if FORECAST_STORE else None
+forecast_cache = ForecastCache(_load_forecast, ttl=FORECAST_TTL, max_entries=FORECAST_CACHE_SIZE,
+                               store=forecast_store, track_ages=True)
+forecast_cache.hydrate()
+
+
+def get_forecast(lat, lon, units=UNITS):
+    return forecast_cache.get((lat, lon, units))
+
+
+def refresh_forecast(lat, lon, units=UNITS):
+    # Fetch now rather than serving stale; fall back to the cache on failure
+    try:
+        return forecast_cache.refresh((lat, lon, units))
+    except (CircuitOpenError, RateLimitedError, SharedCacheMiss):
+        return get_forecast(lat, lon, units)
+    except Exception as e:
+        print(f"Refresh failed for {lat},{lon}: {e}")
+        return get_forecast(lat, lon, units)
+
+
+def snap_coords(lat, lon, grid=None):
+    grid = GRID_SNAP_DEGREES if grid is None else grid
+    if not grid:
+        return lat, lon
+    # Cell centres, rounded so equal cells produce identical float keys
+    return round(round(lat / grid) * grid, 6), round(round(lon / grid) * grid, 6)
+
+
+def forecast_key(coords):
+    return snap_coords(coords["lat"], coords["lon"]) + (UNITS,)
+
+
+def _forecast_age(key):
+    # From the cache's fetch times, not its LRU, so evicted keys aren't due
+    fetched_at = forecast_cache.fetched_at(key)
+    return float("inf") if fetched_at is None else forecast_cache.clock() - fetched_at
+
+
+def _location_keys():
+    return list(dict.fromkeys(forecast_key(coords) for coords in all_locations().values()))
+
+
+# Refreshes forecasts shortly before they go stale, ones readers are waiting
+# on first, then most viewed and stalest, using only the quota left over after
+# a small request-path reserve. Views and misses count from every worker.
+refresh_scheduler = RefreshScheduler(_location_keys, _forecast_age, forecast_cache.refresh, owm_limiter,
+                                     min_age=0.8 * FORECAST_TTL, reserve=max(1, QUOTA_PER_MINUTE // 10),
+                                     shared_counts=shared_counts if REFRESH_SCHEDULER_ENABLED else None)
+
+
+def _fetch_isolated(key, refresh=False, record_view=True):
+    try:
+        if refresh:
+            return refresh_forecast(*key)
+        if record_view:
+            refresh_scheduler.record_view(key)
+        return get_forecast(*key)
+    except Exception as e:
+        return e
+
+
+def fetch_all_forecasts(locations, max_workers=None, refresh=False, deadline=None, record_views=True):
+    # Returns {name: forecast json or the exception raised fetching it}, so a
+    # failing location never affects the others. Locations still pending at
+    # the deadline get their last cached forecast, or a TimeoutError. Only
+    # dashboard fetches should record views for the refresh scheduler.
+    if not locations:
+        return {}
+    keys = {name: forecast_key(coords) for name, coords in locations.items()}
+    unique_keys = list(dict.fromkeys(keys.values()))
+    workers = max(1, min(max_workers or FETCH_CONCURRENCY, len(unique_keys)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = {key: pool.submit(_fetch_isolated, key, refresh, record_views) for key in unique_keys}
+    done, _ = wait(futures.values(), timeout=deadline)
+    # Don't wait for stragglers; they finish in the background and fill the cache
+    pool.shutdown(wait=False)
+
+    by_key = {}
+    for key, future in futures.items():
+        if future in done:
+            by_key[key] = future.result()
+            continue
+        cached = forecast_cache.peek(key)
+        by_key[key] = cached[1] if cached else TimeoutError(f"no forecast within {deadline}s")
+    return {name: by_key[key] for name, key in keys.items()}
+
+
 def parse_forecast(data):
     times, temps_c, hums, rain_mm = [], [], [], []
     for entry in data["list"]:
@@ -60,69 +373,54 @@ def c_to_f_list(temps_c):
     return [tc * 9 / 5 + 32 for tc in temps_c]
 
 
-def daily_metrics_and_alpha_with_rain(times, temps_f, hums, rain_mm):
-    daily_temps = defaultdict(list)
-    daily_humidity = defaultdict(list)
-    daily_rain = defaultdict(float)
-    for t, tf, h, rain in zip(times, temps_f, hums, rain_mm):
-        if 9 <= t.hour < 16:
-            day = t.date()
-            daily_temps[day].append(tf)
-            daily_humidity[day].append(h)
-            if rain > daily_rain[day]:
-                daily_rain[day] = rain
-
-    all_days = sorted({t.date() for t in times})
-    alpha_map = {}
-    day_metrics = {}
-    rain_map = {}
-    min_alpha = 0.0
-    max_alpha = 0.8
-    for day in all_days:
-        temps_day = daily_temps.get(day, [])
-        hum_day = daily_humidity.get(day, [])
-        rain_amt = daily_rain.get(day, 0.0)
-        rain_map[day] = rain_amt
-        if temps_day and hum_day:
-            max_temp = max(temps_day)
-            max_hum = max(hum_day)
-        else:
-            idxs = [i for i, t in enumerate(times) if t.date() == day]
-            max_temp = max(temps_f[i] for i in idxs) if idxs else 0
-            max_hum = max(hums[i] for i in idxs) if idxs else 0
-        day_metrics[day] = (max_temp, max_hum)
+def summarize_days(times, temps_f, hums, rain_mm):
+    n = len(times)
+    day = np.fromiter((t.toordinal() for t in times), dtype=np.int64, count=n)
+    hour = np.fromiter((t.hour for t in times), dtype=np.int64, count=n)
+    return daily_groups(day, hour, np.asarray(temps_f, dtype=np.float64),
+                        np.asarray(hums, dtype=np.float64), np.asarray(rain_mm, dtype=np.float64))
+
+
+# A forecast as arrays plus its day groups, built straight from the epoch
+# seconds; for the paths that score or serialize forecasts without plotting
+ForecastSeries = namedtuple("ForecastSeries", ["epoch", "temps_f", "hums", "rain_mm", "groups"])
+
+
+def forecast_series(data):
+    cols = parse_forecast_columns(data, eastern, dtype=np.float64)
+    temps_f = cols.temps_c * 9 / 5 + 32
+    day, hour = local_day_hour(cols.local_epoch)
+    return ForecastSeries(cols.epoch, temps_f, cols.hums, cols.rain_mm,
+                          daily_groups(day, hour, temps_f, cols.hums, cols.rain_mm))
 
-        if rain_amt > 0:
-            alpha = 0
-        else:
-            if max_temp >= 80 or max_temp <= 32:
-                temp_score = 0.0
-            elif 60 <= max_temp <= 69:
-                temp_score = 1.0
-            elif 40 < max_temp < 60:
-                temp_score = (max_temp - 40) / (60 - 40)
-            elif 69 < max_temp < 80:
-                temp_score = (80 - max_temp) / (80 - 69)
-            else:
-                temp_score = 0.0
-
-            if max_hum <= 50:
-                hum_score = 1.0
-            elif max_hum >= 80:
-                hum_score = 0.0
-            else:
-                hum_score = (80 - max_hum) / (80 - 50)
-
-            combined_score = temp_score * hum_score
-            alpha = min_alpha + (max_alpha - min_alpha) * combined_score
-
-        alpha_map[day] = alpha
+
+EMPTY_SERIES = forecast_series({"list": []})
+
+
+def post_noon_days(groups):
+    return {date.fromordinal(d) for d in groups.day[groups.post_noon].tolist()}
+
+
+def daily_metrics_and_alpha_with_rain(times, temps_f, hums, rain_mm, groups=None):
+    if groups is None:
+        groups = summarize_days(times, temps_f, hums, rain_mm)
+    return daily_scores(groups)
+
+
+def daily_scores(groups):
+    all_days = [date.fromordinal(d) for d in groups.day.tolist()]
+    alphas = batch_alpha(groups.max_temp, groups.max_hum, groups.rain_max, MIN_ALPHA, MAX_ALPHA)
+    alpha_map = dict(zip(all_days, alphas.tolist()))
+    day_metrics = dict(zip(all_days, zip(groups.max_temp.tolist(), groups.max_hum.tolist())))
+    rain_map = dict(zip(all_days, groups.rain_max.tolist()))
 
     return alpha_map, day_metrics, rain_map, all_days
 
 
 def plot_location_forecast(ax, times, temps_f, hums, alpha_map, day_metrics, rain_map, all_days,
-                           loc_name, temp_ylim_max, x_min, x_max, show_xaxis):
+                           loc_name, temp_ylim_max, x_min, x_max, show_xaxis, post_noon=None):
+    if post_noon is None:
+        post_noon = {t.date() for t in times if t.hour >= 12}
     buf = temp_ylim_max * 0.05
     ylim_top = temp_ylim_max + buf
     ax.plot(times, temps_f, color="#8B0000", alpha=0.5, linewidth=1)
@@ -153,8 +451,7 @@ def plot_location_forecast(ax, times, temps_f, hums, alpha_map, day_metrics, rai
         start_num = mdates.date2num(datetime(day.year, day.month, day.day))
         ax.axvline(start_num, color='lightgrey', linewidth=0.7, linestyle='-')
 
-        has_post_noon_data = any(t.date() == day and t.time() >= time(12, 0) for t in times)
-        is_incomplete_day = not has_post_noon_data
+        is_incomplete_day = day not in post_noon
 
         alpha = 0 if is_incomplete_day else alpha_map.get(day, 0)
         max_temp, max_hum = (None, None) if is_incomplete_day else day_metrics.get(day, (0, 0))
@@ -203,22 +500,27 @@ def plot_location_forecast(ax, times, temps_f, hums, alpha_map, day_metrics, rai
     ax.set_title(loc_name, fontweight="bold", fontsize=16)
 
 
-def generate_dashboard_plot():
-    fig, axes = plt.subplots(len(LOCATIONS), 1,
-                             figsize=(12, 3 * len(LOCATIONS)),
-                             sharex=True)
-    if len(LOCATIONS) == 1:
-        axes = [axes]
-
+def load_dashboard_data(refresh=False, deadline=RENDER_DEADLINE, locations=None):
+    # Rows follow the order of `locations` ({id: location}, default the
+    # unselected dashboard's)
+    locations = default_locations() if locations is None else locations
     all_data = []
     max_temp_global = 0
     all_times = []
 
-    for loc_name, coords in LOCATIONS.items():
+    forecasts = fetch_all_forecasts(locations, refresh=refresh, deadline=deadline)
+    parsed = {}  # locations snapped to the same cell share one parsed series
+    for loc_id, loc in locations.items():
+        loc_name = loc["name"]
         try:
-            data = fetch_forecast_by_coords(coords["lat"], coords["lon"])
-            times, temps_c, hums, rain_mm = parse_forecast(data)
-            temps_f = c_to_f_list(temps_c)
+            data = forecasts[loc_id]
+            if isinstance(data, Exception):
+                raise data
+            key = forecast_key(loc)
+            if key not in parsed:
+                times, temps_c, hums, rain_mm = parse_forecast(data)
+                parsed[key] = (times, c_to_f_list(temps_c), hums, rain_mm)
+            times, temps_f, hums, rain_mm = parsed[key]
         except Exception as e:
             print(f"Error loading data for {loc_name}: {e}")
             times, temps_f, hums, rain_mm = [], [], [], []
@@ -234,33 +536,565 @@ def generate_dashboard_plot():
 
     x_min = min(all_times) - timedelta(hours=6)
     x_max = max(all_times) + timedelta(days=1)
+    return all_data, max_temp_global, x_min, x_max
+
+
+def load_forecast_series(locations, deadline=RENDER_DEADLINE):
+    return forecast_series_for(locations, fetch_all_forecasts(locations, deadline=deadline))
+
+
+def forecast_series_for(locations, forecasts):
+    # {id: ForecastSeries} from {id: forecast json or exception}, empty for
+    # locations without a forecast
+    parsed = {}  # locations snapped to the same cell share one series
+    series = {}
+    for loc_id, loc in locations.items():
+        try:
+            data = forecasts[loc_id]
+            if isinstance(data, Exception):
+                raise data
+            key = forecast_key(loc)
+            if key not in parsed:
+                parsed[key] = forecast_series(data)
+            series[loc_id] = parsed[key]
+        except Exception as e:
+            print(f"Error loading data for {loc['name']}: {e}")
+            series[loc_id] = EMPTY_SERIES
+    return series
+
+
+def draw_location(ax, loc_name, times, temps_f, hums, rain_mm, temp_ylim_max, x_min, x_max, show_xaxis):
+    if not times:
+        # Placeholder panel for a location with no forecast yet
+        ax.set_title(loc_name, fontweight="bold", fontsize=16)
+        ax.text(0.5, 0.5, "Forecast unavailable", transform=ax.transAxes,
+                ha="center", va="center", color="grey", fontsize=12)
+        ax.set_yticks([])
+        return
+    groups = summarize_days(times, temps_f, hums, rain_mm)
+    alpha_map, day_metrics, rain_map, all_days = daily_metrics_and_alpha_with_rain(
+        times, temps_f, hums, rain_mm, groups=groups)
+    plot_location_forecast(ax, times, temps_f, hums, alpha_map, day_metrics, rain_map, all_days,
+                           loc_name, temp_ylim_max, x_min, x_max, show_xaxis,
+                           post_noon=post_noon_days(groups))
+
+
+def generate_dashboard_plot(refresh=False, dashboard_data=None, locations=None):
+    dashboard_data = dashboard_data or load_dashboard_data(refresh=refresh, locations=locations)
+    if dashboard_data is None:
+        return None
+    all_data, max_temp_global, x_min, x_max = dashboard_data
+
+    # Explicit Figure/canvas, never pyplot: pyplot's global figure manager is
+    # not thread-safe, while independent Figures can render concurrently.
+    fig = Figure(figsize=(12, 3 * len(all_data)))
+    FigureCanvas(fig)
+    axes = fig.subplots(len(all_data), 1, sharex=True, squeeze=False)[:, 0]
 
     for i, (ax, (loc_name, times, temps_f, hums, rain_mm)) in enumerate(zip(axes, all_data)):
-        if not times:
-            ax.set_title(loc_name, fontweight="bold", fontsize=16)
-            continue
-        alpha_map, day_metrics, rain_map, all_days = daily_metrics_and_alpha_with_rain(times, temps_f, hums, rain_mm)
         show_xaxis = (i == len(axes) - 1)
-        plot_location_forecast(ax, times, temps_f, hums, alpha_map, day_metrics, rain_map, all_days,
-                               loc_name, max_temp_global, x_min, x_max, show_xaxis)
+        draw_location(ax, loc_name, times, temps_f, hums, rain_mm,
+                      max_temp_global, x_min, x_max, show_xaxis)
 
-    plt.tight_layout()
+    fig.tight_layout()
     return fig
 
+
+panel_cache = RasterCache(max_entries=PANEL_CACHE_SIZE)
+
+
+def render_location_panel(loc_name, times, temps_f, hums, rain_mm, temp_ylim_max, x_min, x_max, show_xaxis):
+    bottom = PANEL_BOTTOM_MARGIN + (PANEL_XAXIS_MARGIN if show_xaxis else 0)
+    height = PANEL_TOP_MARGIN + PANEL_AXES_HEIGHT + bottom
+    fig = Figure(figsize=(PANEL_WIDTH, height), dpi=PANEL_DPI)
+    canvas = FigureCanvas(fig)
+    fig.subplots_adjust(left=PANEL_LEFT, right=PANEL_RIGHT,
+                        top=1 - PANEL_TOP_MARGIN / height, bottom=bottom / height)
+    ax = fig.add_subplot(1, 1, 1)
+    draw_location(ax, loc_name, times, temps_f, hums, rain_mm,
+                  temp_ylim_max, x_min, x_max, show_xaxis)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+def panel_args(dashboard_data):
+    all_data, max_temp_global, x_min, x_max = dashboard_data
+    last = len(all_data) - 1
+    return [(loc_name, times, temps_f, hums, rain_mm, max_temp_global, x_min, x_max, i == last)
+            for i, (loc_name, times, temps_f, hums, rain_mm) in enumerate(all_data)]
+
+
+def _panel_key(loc_name, times, temps_f, hums, rain_mm, temp_ylim_max, x_min, x_max, show_xaxis):
+    return series_key(loc_name, [t.timestamp() for t in times], temps_f, hums, rain_mm,
+                      temp_ylim_max, x_min.timestamp(), x_max.timestamp(), show_xaxis)
+
+
+_panel_pool = None
+_panel_pool_lock = threading.Lock()
+
+
+def get_panel_pool(processes=None):
+    global _panel_pool
+    with _panel_pool_lock:
+        if _panel_pool is None:
+            # spawn, not fork: the parent runs fetch and scheduler threads
+            _panel_pool = ProcessPoolExecutor(max_workers=processes or PANEL_RENDER_PROCESSES,
+                                              mp_context=multiprocessing.get_context("spawn"))
+        return _panel_pool
+
+
+def shutdown_panel_pool():
+    global _panel_pool
+    with _panel_pool_lock:
+        if _panel_pool is not None:
+            _panel_pool.shutdown()
+        _panel_pool = None
+
+
+def _render_panel_star(args):
+    return render_location_panel(*args)
+
+
+def render_dashboard_panels(dashboard_data, processes=None):
+    # Only panels whose series or shared axis limits changed are redrawn
+    processes = PANEL_RENDER_PROCESSES if processes is None else processes
+    all_args = panel_args(dashboard_data)
+    keys = [_panel_key(*args) for args in all_args]
+    panels = [panel_cache.get(key) for key in keys]
+    missing = [i for i, raster in enumerate(panels) if raster is None]
+
+    if processes > 0 and len(missing) > 1:
+        rendered = get_panel_pool(processes).map(_render_panel_star, [all_args[i] for i in missing])
+    else:
+        rendered = (render_location_panel(*all_args[i]) for i in missing)
+    for i, raster in zip(missing, rendered):
+        panel_cache.put(keys[i], raster)
+        panels[i] = raster
+    return panels
+
+
+def composite_panels_png(panels):
+    png_image = io.BytesIO()
+    mimage.imsave(png_image, np.vstack(panels), format="png")
+    return png_image.getvalue()
+
+
+def render_dashboard_png(refresh=False, locations=None):
+    dashboard_data = load_dashboard_data(refresh=refresh, locations=locations)
+    if dashboard_data is None:
+        return None
+    if RENDER_MODE == "panels":
+        return composite_panels_png(render_dashboard_panels(dashboard_data))
+    fig = generate_dashboard_plot(dashboard_data=dashboard_data)
+    png_image = io.BytesIO()
+    fig.canvas.print_png(png_image)
+    return png_image.getvalue()
+
+
+def _prerender_dashboard():
+    # Scheduled renders refetch first, so each one reflects the latest forecast
+    return render_flight.do("dashboard", render_dashboard_png, refresh=True)
+
+
+def _publish_dashboard(artifact):
+    if shared_dashboard is not None and shared_writer.held:
+        shared_dashboard.write(artifact)
+
+
+prerender = PrerenderScheduler(_prerender_dashboard, interval=PRERENDER_INTERVAL,
+                               offset=PRERENDER_OFFSET, on_render=_publish_dashboard)
+
+
+def _render_on_request():
+    # Requests arriving while a render is in progress wait for and reuse it
+    return render_flight.do("dashboard", render_dashboard_png)
+
+
+def _shared_dashboard(timeout=SHARED_WAIT):
+    # The writer renders; wait briefly for a recent artifact, then serve
+    # whatever it last published, however old, or None if it never has
+    deadline = perf_counter() + timeout
+    while True:
+        artifact = shared_dashboard.read()
+        now = datetime.now(timezone.utc).timestamp()
+        if artifact is not None and now - artifact.rendered_at < 2 * PRERENDER_INTERVAL:
+            return artifact
+        if perf_counter() >= deadline:
+            return artifact
+        sleep(SHARED_POLL)
+
+
+def current_dashboard(render_now=False):
+    if PRERENDER_ENABLED and not is_writer():
+        return _shared_dashboard()
+    if PRERENDER_ENABLED:
+        prerender.start()
+    elif render_now:
+        return prerender.run_once(_render_on_request)
+    artifact = prerender.latest()
+    if artifact is None:
+        # Only until the first scheduled render lands; joins it if running
+        artifact = prerender.run_once()
+    return artifact
+
+
+def _split_arg(args, name):
+    values = [v.strip() for value in args.getlist(name) for v in value.split(",") if v.strip()]
+    return values or None
+
+
+def parse_selection(args):
+    # None when the request selects nothing, i.e. the full dashboard;
+    # otherwise the matching {id: location}, possibly empty
+    ids, regions = _split_arg(args, "ids"), _split_arg(args, "regions")
+    if ids is None and regions is None:
+        return None
+    return LOCATION_REGISTRY.select(ids=ids, regions=regions)
+
+
+def _render_selection(*ids):
+    started = datetime.now(timezone.utc).timestamp()
+    t0 = perf_counter()
+    png = render_flight.do(("selection",) + ids, render_dashboard_png,
+                           locations=LOCATION_REGISTRY.select(ids=ids))
+    if png is None:
+        raise LookupError("no data available for selection")
+    return make_artifact(png, started, perf_counter() - t0)
+
+
+# Keyed by the selected ids in registry order, so "?regions=NH" and the
+# equivalent "?ids=..." share one entry; served stale while re-rendering
+selection_cache = ForecastCache(_render_selection, ttl=SELECTION_TTL, max_entries=SELECTION_CACHE_SIZE)
+
+
+def selection_url_args(args):
+    # The selection as the request gave it, not the resolved ids, so a
+    # region of hundreds of crags still fits in the image URL
+    url_args = {}
+    for name in ("ids", "regions"):
+        values = _split_arg(args, name)
+        if values:
+            url_args[name] = ",".join(values)
+    return url_args
+
+
+def dashboard_for(args, render_now=False):
+    # (artifact or None, url args identifying the selection); the url args
+    # are None when the selection matches no locations
+    locations = parse_selection(args)
+    if locations is None:
+        return current_dashboard(render_now=render_now), {}
+    if not locations:
+        return None, None
+    try:
+        artifact = selection_cache.get(tuple(capped(locations)))
+    except LookupError:
+        artifact = None
+    return artifact, selection_url_args(args)
+
+
+# Hashed image URLs never change content, so browsers and CDNs may keep them
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+def warm_up():
+    # Draw a throwaway panel so the font cache, text layout and Agg renderer
+    # are loaded before gunicorn forks workers from this process, along with
+    # the location registry
+    LOCATION_REGISTRY.load()
+    now = eastern.localize(datetime(2000, 1, 3, 12))
+    times = [now + timedelta(hours=3 * i) for i in range(8)]
+    render_location_panel("warm-up", times, [60.0] * 8, [50.0] * 8, [0.0] * 8,
+                          60.0, times[0], times[-1], True)
+
+
+def after_fork():
+    # Sockets, SQLite handles and pools must not be shared with the parent
+    reset_session()
+    owm_limiter.after_fork()
+    if forecast_store is not None:
+        forecast_store.after_fork()
+    if shared_writer is not None:
+        shared_writer.after_fork()
+        shared_counts.after_fork()
+    if forecast_archive is not None:
+        forecast_archive.after_fork()
+
+
+@app.before_request
+def start_background_work():
+    # Only the writer refreshes and pre-renders; it takes both over as soon
+    # as it wins the lock, so readers have something to wait for
+    if not is_writer():
+        return
+    if REFRESH_SCHEDULER_ENABLED and not refresh_scheduler.running:
+        refresh_scheduler.start()
+    if PRERENDER_ENABLED and not prerender.running:
+        prerender.start()
+
+
 @app.route("/")
 def index():
     if not API_KEY:
         return "<h1>Error: Please set your OPENWEATHER_API_KEY environment variable.</h1>"
 
-    fig = generate_dashboard_plot()
-    if fig is None:
+    artifact, selection = dashboard_for(request.args, render_now=True)
+    if selection is None:
+        return "<h1>No matching locations.</h1>", 404
+    if artifact is None:
         return "<h1>No data available to plot.</h1>"
 
-    png_image = io.BytesIO()
-    FigureCanvas(fig).print_png(png_image)
-    encoded = base64.b64encode(png_image.getvalue()).decode('utf-8')
-    plt.close(fig)
-    return render_template("index.html", plot_url=f"data:image/png;base64,{encoded}")
+    return render_template("index.html",
+                           plot_url=url_for("dashboard_image", digest=artifact.etag, **selection))
+
+
+@app.route("/dashboard.png")
+@app.route("/dashboard/<digest>.png")
+def dashboard_image(digest=None):
+    if not API_KEY:
+        return "Error: OPENWEATHER_API_KEY is not set.", 503
+    artifact, selection = dashboard_for(request.args)
+    if selection is None:
+        return "No matching locations.", 404
+    if artifact is None:
+        return "No data available to plot.", 404
+    if digest is not None and digest != artifact.etag:
+        # A newer render replaced this one; send the client to the current image
+        return redirect(url_for("dashboard_image", digest=artifact.etag, **selection))
+
+    response = make_response(artifact.png)
+    response.mimetype = "image/png"
+    response.set_etag(artifact.etag)
+    response.last_modified = datetime.fromtimestamp(artifact.rendered_at, timezone.utc)
+    response.cache_control.public = True
+    if digest is None:
+        response.cache_control.max_age = 300
+        response.cache_control.must_revalidate = True
+    else:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    return response.make_conditional(request)
+
+
+def _rounded(values, digits=2):
+    return [round(float(v), digits) for v in values]
+
+
+def location_forecast_json(loc_id, loc, series):
+    alpha_map, day_metrics, rain_map, all_days = daily_scores(series.groups)
+    complete = post_noon_days(series.groups)
+    # Columnar layout: one array per field keeps the payload small
+    return {
+        "id": loc_id,
+        "name": loc["name"],
+        "lat": loc["lat"],
+        "lon": loc["lon"],
+        "regions": list(loc["regions"]),
+        "times": series.epoch.tolist(),
+        "temps_f": _rounded(series.temps_f, 1),
+        "hums": _rounded(series.hums, 0),
+        "rain_mm": _rounded(series.rain_mm),
+        "days": {
+            "date": [day.isoformat() for day in all_days],
+            "start": [int(eastern.localize(datetime.combine(day, time(0, 0))).timestamp()) for day in all_days],
+            "alpha": _rounded((alpha_map[day] for day in all_days), 3),
+            "max_temp_f": _rounded((day_metrics[day][0] for day in all_days), 1),
+            "max_hum": _rounded((day_metrics[day][1] for day in all_days), 0),
+            "rain_mm": _rounded(rain_map[day] for day in all_days),
+            "complete": [day in complete for day in all_days],
+        },
+    }
+
+
+def dashboard_json(series, locations):
+    # None when no location has a forecast; the axis limits match the plot's
+    loaded = [s for s in series.values() if len(s.epoch)]
+    if not loaded:
+        return None
+    max_temp_global = 0
+    for s in loaded:
+        mx = float(s.temps_f.max())
+        if mx > max_temp_global:
+            max_temp_global = mx
+    return {
+        "timezone": eastern.zone,
+        "temp_max_f": round(max_temp_global, 1),
+        "x_min": min(int(s.epoch.min()) for s in loaded) - 6 * 3600,
+        "x_max": max(int(s.epoch.max()) for s in loaded) + 24 * 3600,
+        "locations": [location_forecast_json(loc_id, loc, series[loc_id]) for loc_id, loc in locations.items()],
+    }
+
+
+@app.route("/api/forecast")
+def api_forecast():
+    if not API_KEY:
+        return jsonify({"error": "OPENWEATHER_API_KEY is not set"}), 503
+    locations = parse_selection(request.args)
+    locations = default_locations() if locations is None else capped(locations)
+    if not locations:
+        return jsonify({"error": "No matching locations"}), 404
+    payload = dashboard_json(load_forecast_series(locations), locations)
+    if payload is None:
+        return jsonify({"error": "No data available"}), 503
+    response = jsonify(payload)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def best_day_score(groups, day=None):
+    # Alpha for `day`, or the best alpha over days with afternoon data
+    alpha_map, _, _, _ = daily_scores(groups)
+    complete = post_noon_days(groups)
+    if day is not None:
+        return (alpha_map.get(day, 0), day) if day in complete else (None, day)
+    scored = [(alpha_map[d], d) for d in sorted(complete)]
+    return max(scored, key=lambda item: item[0]) if scored else (None, None)
+
+
+def iter_daily_scores(locations, batch_size=None, deadline=RENDER_DEADLINE):
+    # One row per location and day. Forecasts are fetched a batch at a time,
+    # so memory stays flat however many locations are exported.
+    items = iter(locations.items())
+    while True:
+        batch = dict(islice(items, batch_size or EXPORT_BATCH_SIZE))
+        if not batch:
+            return
+        forecasts = fetch_all_forecasts(batch, deadline=deadline, record_views=False)
+        for loc_id, loc in batch.items():
+            data = forecasts[loc_id]
+            if isinstance(data, Exception):
+                print(f"Skipping {loc['name']} in export: {data}")
+                continue
+            groups = forecast_series(data).groups
+            alpha_map, day_metrics, rain_map, all_days = daily_scores(groups)
+            complete = post_noon_days(groups)
+            for day in all_days:
+                yield {
+                    "id": loc_id,
+                    "name": loc["name"],
+                    "lat": loc["lat"],
+                    "lon": loc["lon"],
+                    "regions": list(loc["regions"]),
+                    "date": day.isoformat(),
+                    "alpha": round(float(alpha_map[day]), 3),
+                    "max_temp_f": round(float(day_metrics[day][0]), 1),
+                    "max_hum": round(float(day_metrics[day][1]), 0),
+                    "rain_mm": round(float(rain_map[day]), 2),
+                    "complete": day in complete,
+                }
+
+
+@app.route("/api/export")
+def api_export():
+    if not API_KEY:
+        return jsonify({"error": "OPENWEATHER_API_KEY is not set"}), 503
+    fmt = request.args.get("format", "csv")
+    if fmt not in ENCODERS:
+        return jsonify({"error": f"format must be one of {sorted(ENCODERS)}"}), 400
+    locations = parse_selection(request.args)
+    if locations is None:
+        locations = all_locations()
+    if not locations:
+        return jsonify({"error": "No matching locations"}), 404
+    body = ENCODERS[fmt](iter_daily_scores(locations))
+    response = Response(stream_with_context(body), mimetype=FORMATS[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename=crag-scores.{fmt}"
+    return response
+
+
+@app.route("/api/nearby")
+def api_nearby():
+    if not API_KEY:
+        return jsonify({"error": "OPENWEATHER_API_KEY is not set"}), 503
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius_km = float(request.args.get("radius_km", 100))
+        k = max(1, min(int(request.args.get("k", 10)), NEARBY_MAX_CANDIDATES))
+        day = date.fromisoformat(request.args["day"]) if "day" in request.args else None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat must be within [-90, 90] and lon within [-180, 180]")
+        if not math.isfinite(radius_km):
+            raise ValueError("radius_km must be finite")
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"bad query: {e}"}), 400
+    radius_km = max(0.0, min(radius_km, NEARBY_MAX_RADIUS_KM))
+
+    # Closest candidates only, and only cached forecasts, so a query costs no
+    # upstream calls; the scheduler fetches the rest for later queries
+    in_radius = spatial_index().query(lat, lon, radius_km)
+    nearest = heapq.nsmallest(NEARBY_MAX_CANDIDATES, in_radius)
+    distances = {loc_id: dist for dist, loc_id in nearest}
+    locations = LOCATION_REGISTRY.select(ids=distances)
+    forecasts = {}
+    pending = set()
+    for loc_id, loc in locations.items():
+        key = forecast_key(loc)
+        data = forecast_cache.cached(key)
+        if data is None:
+            refresh_scheduler.record_miss(key)
+            pending.add(loc_id)
+        else:
+            forecasts[loc_id] = data
+    series = forecast_series_for({loc_id: locations[loc_id] for loc_id in forecasts}, forecasts)
+
+    scored = []
+    for loc_id, loc in locations.items():
+        if loc_id in pending or not len(series[loc_id].epoch):
+            continue
+        score, best = best_day_score(series[loc_id].groups, day=day)
+        if score is not None:
+            scored.append((score, -distances[loc_id], loc_id, loc, best))
+
+    results = [{
+        "id": loc_id,
+        "name": loc["name"],
+        "lat": loc["lat"],
+        "lon": loc["lon"],
+        "regions": list(loc["regions"]),
+        "distance_km": round(-neg_dist, 1),
+        "alpha": round(score, 3),
+        "day": best.isoformat(),
+    } for score, neg_dist, loc_id, loc, best in heapq.nlargest(k, scored, key=lambda s: s[:2])]
+    return jsonify({
+        "lat": lat,
+        "lon": lon,
+        "radius_km": radius_km,
+        "in_radius": len(in_radius),
+        "scored": len(scored),
+        "pending": len(pending),
+        "results": results,
+    })
+
+
+@app.route("/client")
+def client():
+    return render_template("client.html", api_url=url_for("api_forecast"))
+
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "http_pool": pool_stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "forecast_store": forecast_store.stats() if forecast_store else None,
+        "circuit_breaker": owm_breaker.stats(),
+        "rate_limiter": owm_limiter.stats(),
+        "refresh_scheduler": refresh_scheduler.stats(),
+        "fetch_flight": fetch_flight.stats(),
+        "render_flight": render_flight.stats(),
+        "prerender": prerender.stats(),
+        "panel_cache": panel_cache.stats(),
+        "selection_cache": selection_cache.stats(),
+        "archive": forecast_archive.stats() if forecast_archive else None,
+        "shared_cache": {
+            "pid": os.getpid(),
+            "writer": shared_writer.held,
+            "forecasts": shared_forecasts.stats(),
+            "dashboard": shared_dashboard.stats(),
+        } if SHARED_CACHE_DIR else None,
+    })
 
 # Important! This ensures Flask listens on the correct port for Heroku
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# One row per forecast entry per fetched snapshot
+ROW_DTYPE = np.dtype([
+    ("fetched_at", "<i8"),  # epoch seconds of the fetch
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("time", "<i8"),  # epoch seconds the entry forecasts
+    ("temp_c", "<f4"),
+    ("hum", "<f4"),
+    ("rain_mm", "<f4"),
+])
+
+
+def _partition_name(ts):
+    return "fetched=" + datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+class ForecastArchive:
+    # Append-only store of parsed forecast snapshots. Rows are buffered and
+    # written as immutable .npy chunks of ROW_DTYPE records, under one
+    # directory per UTC fetch date. Range queries open only the partitions
+    # overlapping the range and memory-map each chunk.
+
+    def __init__(self, root, flush_rows=2000, flush_interval=60.0):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffered_rows = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._timer = None
+        self.chunks_written = 0
+        self.rows_written = 0
+        os.makedirs(root, exist_ok=True)
+        atexit.register(self.flush)
+
+    def append(self, lat, lon, fetched_at, columns):
+        # columns: a columnar.ForecastColumns for one snapshot
+        rows = np.empty(len(columns.epoch), dtype=ROW_DTYPE)
+        rows["fetched_at"] = int(fetched_at)
+        rows["lat"] = lat
+        rows["lon"] = lon
+        rows["time"] = columns.epoch
+        rows["temp_c"] = columns.temps_c
+        rows["hum"] = columns.hums
+        rows["rain_mm"] = columns.rain_mm
+        with self._lock:
+            self._buffer.append(rows)
+            self._buffered_rows += len(rows)
+            full = self._buffered_rows >= self.flush_rows
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def after_fork(self):
+        # Rows buffered before the fork belong to the parent, which flushes them
+        self._lock = threading.Lock()
+        self._buffer, self._buffered_rows, self._timer = [], 0, None
+
+    def flush(self):
+        with self._lock:
+            buffered, self._buffer, self._buffered_rows = self._buffer, [], 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not buffered:
+                return
+            rows = np.concatenate(buffered)
+            # A chunk may span midnight; split it so each partition holds
+            # only its own fetch date
+            names = np.array([_partition_name(ts) for ts in rows["fetched_at"]])
+            for name in np.unique(names):
+                self._write_chunk(name, rows[names == name])
+
+    def _write_chunk(self, partition, rows):
+        directory = os.path.join(self.root, partition)
+        os.makedirs(directory, exist_ok=True)
+        self._seq += 1
+        name = f"chunk-{int(rows['fetched_at'].min())}-{os.getpid()}-{self._seq}.npy"
+        tmp = os.path.join(directory, "." + name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, rows, allow_pickle=False)
+        # Readers never see a partial chunk
+        os.replace(tmp, os.path.join(directory, name))
+        self.chunks_written += 1
+        self.rows_written += len(rows)
+
+    def partitions(self, start=None, end=None):
+        start_name = _partition_name(start) if start is not None else None
+        end_name = _partition_name(end) if end is not None else None
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith("fetched="):
+                continue
+            if (start_name and name < start_name) or (end_name and name > end_name):
+                continue
+            yield os.path.join(self.root, name)
+
+    def query(self, start=None, end=None, lat=None, lon=None):
+        # Rows fetched in [start, end) (epoch seconds), optionally for one
+        # location, ordered by partition then chunk
+        parts = []
+        for directory in self.partitions(start, None if end is None else end - 1):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".npy") or name.startswith("."):
+                    continue
+                chunk = np.load(os.path.join(directory, name), mmap_mode="r")
+                mask = np.ones(len(chunk), dtype=bool)
+                if start is not None:
+                    mask &= chunk["fetched_at"] >= start
+                if end is not None:
+                    mask &= chunk["fetched_at"] < end
+                if lat is not None:
+                    mask &= (chunk["lat"] == lat) & (chunk["lon"] == lon)
+                if mask.any():
+                    parts.append(np.asarray(chunk[mask]))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=ROW_DTYPE)
+
+    def stats(self):
+        with self._lock:
+            buffered = self._buffered_rows
+        return {
+            "root": self.root,
+            "buffered_rows": buffered,
+            "chunks_written": self.chunks_written,
+            "rows_written": self.rows_written,
+        }
+
+
+def day_range(day):
+    # [start, end) epoch seconds for a UTC date, for ForecastArchive.query
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
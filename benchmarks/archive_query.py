@@ -0,0 +1,53 @@
+# Fills an archive with a year of 3-hourly snapshots for 100 crags and times
+# day, week and full-range queries against it.
+# Run from the repository root: python -m benchmarks.archive_query
+import tempfile
+import time
+from datetime import date, timedelta
+
+from archive import ForecastArchive, day_range
+from benchmarks.stub_server import make_forecast_payload
+from columnar import parse_forecast_columns
+from app import eastern
+
+CRAGS = 100
+DAYS = 365
+SNAPSHOTS_PER_DAY = 8
+
+
+def fill(archive, first_day):
+    start, _ = day_range(first_day)
+    for d in range(DAYS):
+        for s in range(SNAPSHOTS_PER_DAY):
+            fetched_at = start + d * 86400 + s * 10800
+            columns = parse_forecast_columns(make_forecast_payload(start=fetched_at), eastern)
+            for crag in range(CRAGS):
+                archive.append(40 + crag * 0.01, -72.0, fetched_at, columns)
+    archive.flush()
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    rows = fn()
+    print(f"{label:>18}: {len(rows):>10} rows in {(time.perf_counter() - start) * 1000:8.1f}ms")
+
+
+def main():
+    first_day = date(2025, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ForecastArchive(tmp, flush_rows=CRAGS * SNAPSHOTS_PER_DAY * 40)
+        start = time.perf_counter()
+        fill(archive, first_day)
+        print(f"wrote {archive.rows_written} rows in {archive.chunks_written} chunks "
+              f"in {time.perf_counter() - start:.1f}s")
+        mid = first_day + timedelta(days=180)
+        day_start, day_end = day_range(mid)
+        week_end = day_range(mid + timedelta(days=6))[1]
+        timed("one day", lambda: archive.query(day_start, day_end))
+        timed("one day, one crag", lambda: archive.query(day_start, day_end, 40.5, -72.0))
+        timed("one week", lambda: archive.query(day_start, week_end))
+        timed("full year", lambda: archive.query())
+
+
+if __name__ == "__main__":
+    main()
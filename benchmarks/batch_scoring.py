@@ -0,0 +1,69 @@
+# Scores a locations x days grid with columnar.batch_alpha and with the
+# original per-day scalar scorer, checking the results match exactly.
+# Run from the repository root: python -m benchmarks.batch_scoring
+import time
+
+import numpy as np
+
+from columnar import MAX_ALPHA, MIN_ALPHA, batch_alpha
+
+LOCATIONS = 10_000
+DAYS = 5
+
+
+def scalar_alpha(max_temp, max_hum, rain_amt):
+    # The scorer the app used before batch_alpha, kept as the reference
+    if rain_amt > 0:
+        return 0
+    if max_temp >= 80 or max_temp <= 32:
+        temp_score = 0.0
+    elif 60 <= max_temp <= 69:
+        temp_score = 1.0
+    elif 40 < max_temp < 60:
+        temp_score = (max_temp - 40) / (60 - 40)
+    elif 69 < max_temp < 80:
+        temp_score = (80 - max_temp) / (80 - 69)
+    else:
+        temp_score = 0.0
+    if max_hum <= 50:
+        hum_score = 1.0
+    elif max_hum >= 80:
+        hum_score = 0.0
+    else:
+        hum_score = (80 - max_hum) / (80 - 50)
+    return MIN_ALPHA + (MAX_ALPHA - MIN_ALPHA) * (temp_score * hum_score)
+
+
+def make_grid(rng):
+    shape = (LOCATIONS, DAYS)
+    max_temp = rng.uniform(20, 95, shape)
+    max_hum = rng.uniform(20, 100, shape)
+    # Include every breakpoint so the piecewise edges are exercised
+    edges_t = np.array([32, 40, 60, 69, 80], dtype=np.float64)
+    edges_h = np.array([50, 80], dtype=np.float64)
+    max_temp.flat[:edges_t.size] = edges_t
+    max_hum.flat[:edges_h.size] = edges_h
+    rain = np.where(rng.random(shape) < 0.2, rng.uniform(0, 5, shape), 0.0)
+    return max_temp, max_hum, rain
+
+
+def main():
+    max_temp, max_hum, rain = make_grid(np.random.default_rng(0))
+
+    start = time.perf_counter()
+    scalar = np.array([[scalar_alpha(t, h, r) for t, h, r in zip(*rows)]
+                       for rows in zip(max_temp.tolist(), max_hum.tolist(), rain.tolist())])
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = batch_alpha(max_temp, max_hum, rain)
+    batch_s = time.perf_counter() - start
+
+    if not np.array_equal(scalar, batch):
+        raise SystemExit(f"{np.count_nonzero(scalar != batch)} scores differ from the scalar scorer")
+    print(f"{LOCATIONS} locations x {DAYS} days: scalar {scalar_s * 1000:.1f}ms, "
+          f"batch {batch_s * 1000:.1f}ms ({scalar_s / batch_s:.0f}x), results identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Peak Python heap of the streaming CSV export as the number of locations
+# grows, against building every row first and joining the encoded export,
+# as a non-streaming endpoint would. The stub serves 16 days of hourly
+# forecast per crag so the export itself, not fixed overhead, dominates.
+# Run from the repository root: python -m benchmarks.export_memory
+import tracemalloc
+
+import app
+from benchmarks.stub_server import StubForecastServer, make_forecast_payload
+from export import csv_chunks
+from rate_limit import RateLimiter
+
+COUNTS = [100, 400, 1600]
+PAYLOAD = make_forecast_payload(n_entries=16 * 24, step=3600)
+
+
+def make_locations(n):
+    return {f"crag-{i}": {"name": f"Crag {i}", "lat": 42.0 + i * 0.01, "lon": -72.0 - i * 0.01,
+                          "regions": ["MA"]} for i in range(n)}
+
+
+def streamed(locations):
+    return sum(len(chunk) for chunk in csv_chunks(app.iter_daily_scores(locations)))
+
+
+def materialized(locations):
+    rows = list(app.iter_daily_scores(locations))
+    return len("".join(list(csv_chunks(rows))))
+
+
+def peak(export, locations):
+    # Forecasts are fetched fresh each run so the cache holds the same amount
+    app.forecast_cache.clear()
+    tracemalloc.start()
+    size = export(locations)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak_bytes
+
+
+def main():
+    with StubForecastServer(delay=0, payload=PAYLOAD) as stub:
+        app.FORECAST_URL = stub.url
+        app.API_KEY = "stub"
+        app.forecast_cache.store = None
+        app.forecast_cache.max_entries = app.EXPORT_BATCH_SIZE
+        app.forecast_archive = None
+        app.owm_limiter = RateLimiter(10 ** 6, 10 ** 9)
+        peak(streamed, make_locations(COUNTS[0]))  # warm up imports and pools
+        print(f"{'locations':>9}  {'bytes':>9}  {'streamed peak':>13}  {'materialized peak':>17}")
+        for n in COUNTS:
+            locations = make_locations(n)
+            size, stream_peak = peak(streamed, locations)
+            _, full_peak = peak(materialized, locations)
+            print(f"{n:>9}  {size:>9}  {stream_peak / 1024:>11.0f}KB  {full_peak / 1024:>15.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
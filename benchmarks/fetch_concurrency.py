@@ -0,0 +1,46 @@
+# Compares sequential and concurrent forecast fetching against a local stub.
+# Run from the repository root: python -m benchmarks.fetch_concurrency
+import time
+
+import app
+from benchmarks.stub_server import StubForecastServer
+from rate_limit import RateLimiter
+
+DELAY = 0.05
+COUNTS = [1, 2, 4, 7, 16, 32]
+
+
+def make_locations(n):
+    return {f"Crag {i}": {"lat": 42.0 + i * 0.01, "lon": -72.0 - i * 0.01} for i in range(n)}
+
+
+def timed(locations, max_workers):
+    # Measure upstream fetching, not the forecast cache, SQLite store or archive
+    app.forecast_cache.clear()
+    start = time.perf_counter()
+    results = app.fetch_all_forecasts(locations, max_workers=max_workers)
+    elapsed = time.perf_counter() - start
+    failures = [name for name, r in results.items() if isinstance(r, Exception)]
+    if failures:
+        raise RuntimeError(f"stub fetch failed for {failures}")
+    return elapsed
+
+
+def main():
+    with StubForecastServer(delay=DELAY) as stub:
+        app.FORECAST_URL = stub.url
+        app.API_KEY = "stub"
+        app.forecast_cache.store = None
+        app.forecast_archive = None
+        app.owm_limiter = RateLimiter(10 ** 6, 10 ** 9)
+        print(f"stub latency {DELAY * 1000:.0f} ms, concurrency limit {app.FETCH_CONCURRENCY}")
+        print(f"{'locations':>9}  {'sequential':>10}  {'concurrent':>10}  {'speedup':>7}")
+        for n in COUNTS:
+            locations = make_locations(n)
+            seq = timed(locations, max_workers=1)
+            par = timed(locations, max_workers=app.FETCH_CONCURRENCY)
+            print(f"{n:>9}  {seq * 1000:>8.0f}ms  {par * 1000:>8.0f}ms  {seq / par:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
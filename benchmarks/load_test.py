@@ -0,0 +1,81 @@
+# Measures "/" throughput of the Flask development server and of gunicorn
+# with gunicorn.conf.py, both fetching from a local stub upstream.
+# Run from the repository root: python -m benchmarks.load_test [seconds] [clients]
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_server import StubForecastServer
+
+SERVERS = {
+    "flask dev server": [sys.executable, "app.py"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def hammer(url, seconds, clients):
+    deadline = time.monotonic() + seconds
+    session = requests.Session()
+
+    def client(_):
+        done = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                ok = session.get(url, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            done += ok
+            errors += not ok
+        return done, errors
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with StubForecastServer(delay=0.05) as stub:
+        for name, cmd in SERVERS.items():
+            port = free_port()
+            env = dict(os.environ, PORT=str(port), FORECAST_URL=stub.url,
+                       OPENWEATHER_API_KEY="stub", FORECAST_STORE="", ARCHIVE_DIR="",
+                       # Render on every request to load the CPU-heavy path
+                       PRERENDER_ENABLED="0", RENDER_MODE="figure")
+            proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                url = f"http://127.0.0.1:{port}/"
+                wait_until_up(url)
+                ok, errors = hammer(url, seconds, clients)
+                print(f"{name:>17}: {ok / seconds:6.2f} req/s ({ok} ok, {errors} errors, "
+                      f"{clients} clients, {seconds:.0f}s)")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Radius queries over 50k synthetic crags: GridIndex against a linear
+# haversine scan, and heap top-K against a full sort of the matches.
+# Run from the repository root: python -m benchmarks.nearby_index
+import heapq
+import math
+import random
+import time
+
+import numpy as np
+
+from spatial import GridIndex, haversine_km
+
+COUNT = 50_000
+QUERIES = 200
+RADIUS_KM = 80
+K = 10
+
+
+def linear_scan(points, lat, lon, radius_km):
+    found = []
+    for point_id, plat, plon in points:
+        # Scalar haversine, as a plain loop over the registry would do it
+        p1, p2 = math.radians(lat), math.radians(plat)
+        a = (math.sin((p2 - p1) / 2) ** 2
+             + math.cos(p1) * math.cos(p2) * math.sin(math.radians(plon - lon) / 2) ** 2)
+        dist = 2 * 6371.0088 * math.asin(math.sqrt(min(a, 1.0)))
+        if dist <= radius_km:
+            found.append((dist, point_id))
+    return found
+
+
+def main():
+    rng = random.Random(0)
+    points = [(f"crag-{i}", rng.uniform(25, 49), rng.uniform(-124, -67)) for i in range(COUNT)]
+    queries = [(rng.uniform(30, 45), rng.uniform(-120, -70)) for _ in range(QUERIES)]
+    scores = {point_id: rng.random() for point_id, _, _ in points}
+
+    start = time.perf_counter()
+    index = GridIndex(points)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.query(lat, lon, RADIUS_KM) for lat, lon in queries]
+    index_s = (time.perf_counter() - start) / QUERIES
+
+    sample = queries[:20]
+    start = time.perf_counter()
+    scanned = [linear_scan(points, lat, lon, RADIUS_KM) for lat, lon in sample]
+    scan_s = (time.perf_counter() - start) / len(sample)
+    for got, want in zip(indexed, scanned):
+        assert sorted(p for _, p in got) == sorted(p for _, p in want)
+
+    lats = np.array([p[1] for p in points])
+    lons = np.array([p[2] for p in points])
+    start = time.perf_counter()
+    for lat, lon in queries:
+        np.flatnonzero(haversine_km(lat, lon, lats, lons) <= RADIUS_KM)
+    vector_s = (time.perf_counter() - start) / QUERIES
+
+    # Top-K over every crag's score, the worst case for a huge radius
+    everything = [(scores[p], p) for p, _, _ in points]
+    start = time.perf_counter()
+    for _ in range(20):
+        top_heap = heapq.nlargest(K, everything)
+    heap_s = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    for _ in range(20):
+        top_sort = sorted(everything, reverse=True)[:K]
+    sort_s = (time.perf_counter() - start) / 20
+    assert top_heap == top_sort
+
+    matches = sum(len(r) for r in indexed) / QUERIES
+    print(f"{COUNT} crags, {RADIUS_KM} km radius, {matches:.0f} matches per query on average")
+    print(f"index build {build_s * 1000:.0f}ms")
+    print(f"query: grid index {index_s * 1000:.2f}ms, numpy full scan {vector_s * 1000:.2f}ms, "
+          f"python linear scan {scan_s * 1000:.1f}ms")
+    print(f"top-{K} of {COUNT}: heap {heap_s * 1000:.1f}ms, full sort {sort_s * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
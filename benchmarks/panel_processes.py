@@ -0,0 +1,63 @@
+# Compares the single-figure render with composited panels drawn in-process
+# and in a process pool. Run from the repository root:
+#   python -m benchmarks.panel_processes [processes]
+import io
+import os
+import sys
+import time
+
+import app
+from benchmarks.stub_server import make_forecast_payload
+
+COUNTS = [1, 2, 4, 7, 14, 28]
+
+
+def make_dashboard_data(n):
+    times, temps_c, hums, rain_mm = app.parse_forecast(make_forecast_payload())
+    temps_f = app.c_to_f_list(temps_c)
+    all_data = []
+    for i in range(n):
+        # Shift each crag a little so no two panels are identical
+        shifted = [tf + i * 0.1 for tf in temps_f]
+        all_data.append((f"Crag {i}", times, shifted, hums, rain_mm))
+    max_temp = max(max(row[2]) for row in all_data)
+    return all_data, max_temp, min(times) - app.timedelta(hours=6), max(times) + app.timedelta(days=1)
+
+
+def figure_path(data):
+    fig = app.generate_dashboard_plot(dashboard_data=data)
+    buf = io.BytesIO()
+    fig.canvas.print_png(buf)
+    return buf.getvalue()
+
+
+def panel_path(data, processes):
+    app.panel_cache.clear()
+    return app.composite_panels_png(app.render_dashboard_panels(data, processes=processes))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 2)
+    app.panel_cache.max_entries = max(COUNTS)
+    # Start the workers up front so spawn/import cost is not measured
+    app.get_panel_pool(processes).map(app._render_panel_star, app.panel_args(make_dashboard_data(processes)))
+    figure_path(make_dashboard_data(1))
+    print(f"{processes} worker processes, {os.cpu_count()} CPUs")
+    print(f"{'locations':>9}  {'figure':>8}  {'panels':>8}  {'pool':>8}  {'speedup':>7}")
+    for n in COUNTS:
+        data = make_dashboard_data(n)
+        fig_s = timed(figure_path, data)
+        serial_s = timed(panel_path, data, 0)
+        pool_s = timed(panel_path, data, processes)
+        print(f"{n:>9}  {fig_s * 1000:>6.0f}ms  {serial_s * 1000:>6.0f}ms  {pool_s * 1000:>6.0f}ms  {fig_s / pool_s:>6.1f}x")
+    app.shutdown_panel_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# Compares the list-based parse_forecast with the NumPy columnar parser.
+# Run from the repository root: python -m benchmarks.parse_forecast
+import timeit
+
+import numpy as np
+
+import app
+from benchmarks.stub_server import make_forecast_payload
+from columnar import parse_forecast_columns
+
+SIZES = [40, 10_000]
+
+
+def check_equivalent(payload):
+    times, temps_c, hums, rain_mm = app.parse_forecast(payload)
+    cols = parse_forecast_columns(payload, app.eastern)
+    local = [int(t.timestamp() + t.utcoffset().total_seconds()) for t in times]
+    assert np.array_equal(cols.local_epoch, local)
+    assert np.allclose(cols.temps_c, temps_c) and np.allclose(cols.hums, hums)
+    assert np.allclose(cols.rain_mm, rain_mm)
+
+
+def main():
+    print(f"{'entries':>7}  {'lists':>10}  {'columnar':>10}  {'speedup':>7}")
+    for n in SIZES:
+        # Hourly steps so long payloads cross DST transitions
+        payload = make_forecast_payload(n_entries=n, step=3600)
+        check_equivalent(payload)
+        number = max(1, 200_000 // n)
+        lists = min(timeit.repeat(lambda: app.parse_forecast(payload), number=number, repeat=5)) / number
+        cols = min(timeit.repeat(lambda: parse_forecast_columns(payload, app.eastern),
+                                 number=number, repeat=5)) / number
+        print(f"{n:>7}  {lists * 1e6:>8.0f}us  {cols * 1e6:>8.0f}us  {lists / cols:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Writes a synthetic registry of 10k crags and times loading and selecting it.
+# Run from the repository root: python -m benchmarks.registry_load
+import csv
+import os
+import random
+import tempfile
+import time
+
+from registry import LocationRegistry
+
+COUNT = 10_000
+REGIONS = ["NH", "VT", "ME", "MA", "NY", "CT", "RI", "PA", "WV", "NC"]
+
+
+def write_registry(path, count):
+    rng = random.Random(0)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "lat", "lon", "region"])
+        for i in range(count):
+            writer.writerow([f"crag-{i}", f"Crag {i}", round(rng.uniform(35, 47), 4),
+                             round(rng.uniform(-80, -67), 4), rng.choice(REGIONS)])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "locations.csv")
+        write_registry(path, COUNT)
+        registry = LocationRegistry(path)
+        start = time.perf_counter()
+        registry.load()
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        subset = registry.select(regions=["NH", "VT"])
+        select_s = time.perf_counter() - start
+        print(f"loaded {len(registry)} crags in {load_s * 1000:.0f}ms; "
+              f"selected {len(subset)} by region in {select_s * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
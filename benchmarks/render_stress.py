@@ -0,0 +1,49 @@
+# Renders the dashboard from many threads at once and checks every thread
+# produced byte-identical PNGs. Run from the repository root:
+#   python -m benchmarks.render_stress [threads] [rounds]
+import hashlib
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from benchmarks.panel_processes import make_dashboard_data
+
+
+def render_figure(data):
+    buf = io.BytesIO()
+    app.generate_dashboard_plot(dashboard_data=data).canvas.print_png(buf)
+    return buf.getvalue()
+
+
+def render_panels(data):
+    # Bypass the panel cache so every thread really draws
+    return app.composite_panels_png([app.render_location_panel(*args) for args in app.panel_args(data)])
+
+
+def stress(name, render, data, threads, rounds):
+    expected = hashlib.sha256(render(data)).hexdigest()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        digests = list(pool.map(lambda _: hashlib.sha256(render(data)).hexdigest(),
+                                range(threads * rounds)))
+    elapsed = time.perf_counter() - start
+    mismatches = sum(1 for d in digests if d != expected)
+    print(f"{name:>7}: {len(digests)} renders on {threads} threads in {elapsed:.1f}s, "
+          f"{mismatches} mismatched")
+    return mismatches
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    data = make_dashboard_data(7)
+    failed = stress("figure", render_figure, data, threads, rounds)
+    failed += stress("panels", render_panels, data, threads, rounds)
+    if failed:
+        sys.exit(f"{failed} concurrent renders differed from the reference render")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_forecast_payload(n_entries=40, start=1700000000, step=3 * 3600):
+    entries = []
+    for i in range(n_entries):
+        entry = {
+            "dt": start + i * step,
+            "main": {"temp": 5 + (i % 8) * 2.5, "humidity": 40 + (i * 7) % 55},
+        }
+        if i % 11 == 3:
+            entry["rain"] = {"3h": 0.4 + (i % 3) * 0.3}
+        entries.append(entry)
+    return {"cod": "200", "cnt": n_entries, "list": entries}
+
+
+class StubForecastServer:
+    # Local stand-in for api.openweathermap.org that answers every request with
+    # the same forecast after a fixed delay, so benchmarks measure our side only.
+
+    def __init__(self, delay=0.05, payload=None):
+        self.delay = delay
+        self.body = json.dumps(payload or make_forecast_payload()).encode("utf-8")
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment; separate small writes on a
+            # keep-alive socket stall on Nagle + delayed ACK
+            wbufsize = 1 << 16
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/data/2.5/forecast"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,87 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # Trips open after failure_threshold consecutive failures and rejects calls
+    # for reset_timeout seconds. It then lets up to half_open_max probe calls
+    # through: a successful probe closes it, a failed one reopens it.
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60, half_open_max=1,
+                 is_failure=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.is_failure = is_failure or (lambda exc: True)
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.short_circuits = 0
+        self.last_error = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    self.short_circuits += 1
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_max:
+                    self.short_circuits += 1
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, probe in progress")
+                self._probes += 1
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.trips += 1
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                if self.state == HALF_OPEN:
+                    self._probes -= 1
+                if self.is_failure(e):
+                    self.consecutive_failures += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                        self._trip()
+            raise
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.opened_at = None
+        return result
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (self.clock() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "trips": self.trips,
+                "short_circuits": self.short_circuits,
+                "retry_in": retry_in,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,114 @@
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+# Day numbers below count like date.toordinal()
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Bounds of the green shading a day's score maps to
+MIN_ALPHA = 0.0
+MAX_ALPHA = 0.8
+
+# epoch/local_epoch are int64 seconds; local_epoch is shifted by the zone's
+# UTC offset at each instant, so local_epoch // 86400 is the local day number.
+ForecastColumns = namedtuple("ForecastColumns", ["epoch", "local_epoch", "temps_c", "hums", "rain_mm"])
+
+_offset_tables = {}
+_offset_lock = threading.Lock()
+
+
+def offset_table(tz):
+    # (transition epochs, offset seconds) sorted by transition, built once per zone
+    key = str(tz)
+    table = _offset_tables.get(key)
+    if table is not None:
+        return table
+    # pytz zones with DST carry their full transition list; fixed zones do not
+    transitions = getattr(tz, "_utc_transition_times", None)
+    if transitions:
+        epoch0 = datetime(1970, 1, 1)
+        starts = np.array([int((t - epoch0).total_seconds()) for t in transitions], dtype=np.int64)
+        starts[0] = np.iinfo(np.int64).min
+        offsets = np.array([int(info[0].total_seconds()) for info in tz._transition_info], dtype=np.int64)
+    else:
+        starts = np.array([np.iinfo(np.int64).min], dtype=np.int64)
+        offsets = np.array([int(tz.utcoffset(datetime(2000, 1, 1)).total_seconds())], dtype=np.int64)
+    with _offset_lock:
+        _offset_tables[key] = (starts, offsets)
+    return starts, offsets
+
+
+def utc_offsets(epoch, tz):
+    starts, offsets = offset_table(tz)
+    return offsets[np.searchsorted(starts, epoch, side="right") - 1]
+
+
+def _rain(entry):
+    rain = entry.get("rain")
+    if isinstance(rain, dict):
+        return rain.get("3h", rain.get("1h", 0))
+    return 0
+
+
+def parse_forecast_columns(data, tz, dtype=np.float32):
+    entries = data["list"]
+    n = len(entries)
+    epoch = np.fromiter((e["dt"] for e in entries), dtype=np.int64, count=n)
+    temps_c = np.fromiter((e["main"]["temp"] for e in entries), dtype=dtype, count=n)
+    hums = np.fromiter((e["main"]["humidity"] for e in entries), dtype=dtype, count=n)
+    rain_mm = np.fromiter((_rain(e) for e in entries), dtype=dtype, count=n)
+    return ForecastColumns(epoch, epoch + utc_offsets(epoch, tz), temps_c, hums, rain_mm)
+
+
+def local_day_hour(local_epoch):
+    # (day number, hour) of each local timestamp, as daily_groups takes them
+    day, seconds = np.divmod(local_epoch, SECONDS_PER_DAY)
+    return day + EPOCH_ORDINAL, seconds // 3600
+
+
+DailyGroups = namedtuple("DailyGroups", ["day", "max_temp", "max_hum", "rain_max", "post_noon"])
+
+
+def daily_groups(day, hour, temps, hums, rain_mm, window=(9, 16)):
+    # One grouped pass per column over samples bucketed by day number. Daily
+    # maxima come from samples inside the hour window when the day has any,
+    # otherwise from the whole day; rain only counts inside the window.
+    if len(day) == 0:
+        empty = np.array([], dtype=np.float64)
+        return DailyGroups(np.array([], dtype=np.int64), empty, empty, empty, np.array([], dtype=bool))
+    order = np.argsort(day, kind="stable")
+    day, hour = day[order], hour[order]
+    temps, hums, rain_mm = temps[order], hums[order], rain_mm[order]
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+
+    in_window = (hour >= window[0]) & (hour < window[1])
+    has_window = np.logical_or.reduceat(in_window, starts)
+    max_temp = np.where(has_window,
+                        np.maximum.reduceat(np.where(in_window, temps, -np.inf), starts),
+                        np.maximum.reduceat(temps, starts))
+    max_hum = np.where(has_window,
+                       np.maximum.reduceat(np.where(in_window, hums, -np.inf), starts),
+                       np.maximum.reduceat(hums, starts))
+    rain_max = np.maximum.reduceat(np.where(in_window, rain_mm, 0.0), starts)
+    post_noon = np.logical_or.reduceat(hour >= 12, starts)
+    return DailyGroups(day[starts], max_temp, max_hum, rain_max, post_noon)
+
+
+def batch_alpha(max_temp, max_hum, rain_mm, min_alpha=MIN_ALPHA, max_alpha=MAX_ALPHA):
+    # Day scores over arrays of any matching shape, e.g. locations x days:
+    # piecewise-linear temperature and humidity scores, zero on rainy days
+    t = np.asarray(max_temp, dtype=np.float64)
+    h = np.asarray(max_hum, dtype=np.float64)
+    rain = np.asarray(rain_mm, dtype=np.float64)
+
+    temp_score = np.select(
+        [(t >= 80) | (t <= 32), (t >= 60) & (t <= 69), (t > 40) & (t < 60), (t > 69) & (t < 80)],
+        [0.0, 1.0, (t - 40) / (60 - 40), (80 - t) / (80 - 69)],
+        default=0.0,
+    )
+    hum_score = np.select([h <= 50, h >= 80], [1.0, 0.0], default=(80 - h) / (80 - 50))
+    alpha = min_alpha + (max_alpha - min_alpha) * (temp_score * hum_score)
+    return np.where(rain > 0, 0.0, alpha)
@@ -0,0 +1,114 @@
+# Streaming encoders for the daily score export, plus its command line:
+#   python -m export --format csv --regions NH,MA --output scores.csv
+import argparse
+import csv
+import io
+import json
+import sys
+
+FIELDS = ["id", "name", "lat", "lon", "regions", "date", "alpha",
+          "max_temp_f", "max_hum", "rain_mm", "complete"]
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+CHUNK_BYTES = 64 * 1024
+
+
+def csv_chunks(rows, chunk_bytes=CHUNK_BYTES):
+    # Yields the header and rows as text chunks of roughly chunk_bytes
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(dict(row, regions=";".join(row["regions"])))
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def ndjson_chunks(rows, chunk_bytes=CHUNK_BYTES):
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(row, separators=(",", ":")) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield "".join(lines)
+
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+}
+
+
+def write_parquet(rows, path, batch_rows=10_000):
+    # Optional: needs pyarrow. Rows go out one row group per batch.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()), ("name", pa.string()), ("lat", pa.float64()),
+        ("lon", pa.float64()), ("regions", pa.list_(pa.string())), ("date", pa.string()),
+        ("alpha", pa.float64()), ("max_temp_f", pa.float64()), ("max_hum", pa.float64()),
+        ("rain_mm", pa.float64()), ("complete", pa.bool_()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def _split(value):
+    values = [v.strip() for v in (value or "").split(",") if v.strip()]
+    return values or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export daily crag scores")
+    parser.add_argument("--format", choices=sorted(ENCODERS) + ["parquet"], default="csv")
+    parser.add_argument("--ids", help="comma-separated location ids (default all)")
+    parser.add_argument("--regions", help="comma-separated regions")
+    parser.add_argument("--output", default="-", help="file to write, - for stdout")
+    args = parser.parse_args(argv)
+
+    import app  # deferred: importing app starts loading config and caches
+    if not app.API_KEY:
+        parser.error("OPENWEATHER_API_KEY is not set")
+    ids, regions = _split(args.ids), _split(args.regions)
+    locations = app.LOCATION_REGISTRY.select(ids=ids, regions=regions)
+    if not locations:
+        parser.error("no matching locations")
+    rows = app.iter_daily_scores(locations)
+
+    if args.format == "parquet":
+        if args.output == "-":
+            parser.error("parquet needs --output")
+        try:
+            write_parquet(rows, args.output)
+        except ImportError:
+            parser.error("parquet export needs pyarrow installed")
+        return
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        for chunk in ENCODERS[args.format](rows):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A loader may return this instead of a bare value, e.g. for a copy another
+# process fetched: it keeps its original fetch time, and persist=False keeps
+# it out of the store
+Loaded = namedtuple("Loaded", ["fetched_at", "value", "persist"])
+
+
+class ForecastCache:
+    # LRU cache with a freshness TTL. Entries older than the TTL are still
+    # served, and a single background refresh per key replaces them, so once a
+    # key is warm callers never wait on the loader. With a store, loaded values
+    # are written through and misses are read back from it before loading.
+    # With track_ages, fetch times are also kept for keys the LRU evicted.
+
+    def __init__(self, loader, ttl, max_entries=512, clock=time.time, store=None, track_ages=False):
+        self.loader = loader
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (fetched_at, value)
+        self._fetched = {} if track_ages else None  # key -> fetched_at
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.store_hits = 0
+        self.store_errors = 0
+
+    def get(self, key):
+        self._restore(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                fetched_at, value = entry
+                if self.clock() - fetched_at < self.ttl:
+                    self.hits += 1
+                    return value
+                self.stale += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+                return value
+            self.misses += 1
+        return self._load(key)
+
+    def _load(self, key):
+        loaded = self.loader(*key)
+        if isinstance(loaded, Loaded):
+            self.put(key, loaded.value, fetched_at=loaded.fetched_at, persist=loaded.persist)
+            return loaded.value
+        self.put(key, loaded)
+        return loaded
+
+    def cached(self, key):
+        # The cached or stored value, fresh or not, without ever loading
+        entry = self.peek(key) or self._restore(key)
+        return None if entry is None else entry[1]
+
+    def _restore(self, key):
+        if self.store is None or self.peek(key) is not None:
+            return None
+        entry = self._read_store(key)
+        if entry is not None:
+            self.put(key, entry[1], fetched_at=entry[0], persist=False)
+        return entry
+
+    def put(self, key, value, fetched_at=None, persist=True):
+        fetched_at = self.clock() if fetched_at is None else fetched_at
+        with self._lock:
+            self._entries[key] = (fetched_at, value)
+            self._entries.move_to_end(key)
+            if self._fetched is not None:
+                self._fetched[key] = fetched_at
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if persist and self.store is not None:
+            try:
+                self.store.put(key, fetched_at, value)
+            except Exception as e:
+                self.store_errors += 1
+                print(f"Forecast store write failed for {key}: {e}")
+
+    def hydrate(self):
+        # Load persisted entries with their original fetch times, so only the
+        # ones already past the TTL get refreshed
+        if self.store is None:
+            return 0
+        count = 0
+        try:
+            if self._fetched is not None:
+                fetched = dict(self.store.fetched_times())
+                with self._lock:
+                    self._fetched.update(fetched)
+            for key, fetched_at, value in self.store.load_all(limit=self.max_entries):
+                self.put(key, value, fetched_at=fetched_at, persist=False)
+                count += 1
+        except Exception as e:
+            self.store_errors += 1
+            print(f"Forecast store hydrate failed: {e}")
+        return count
+
+    def _read_store(self, key):
+        try:
+            entry = self.store.get(key)
+        except Exception as e:
+            self.store_errors += 1
+            print(f"Forecast store read failed for {key}: {e}")
+            return None
+        if entry is not None:
+            with self._lock:
+                self.store_hits += 1
+        return entry
+
+    def refresh(self, key):
+        value = self._load(key)
+        with self._lock:
+            self.refreshes += 1
+        return value
+
+    def peek(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def fetched_at(self, key):
+        # When key was last fetched, even if since evicted; None if never
+        with self._lock:
+            if self._fetched is not None:
+                return self._fetched.get(key)
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def _refresh(self, key):
+        try:
+            self._load(key)
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            with self._lock:
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round((self.hits + self.stale) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "refreshing": len(self._refreshing),
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "store_hits": self.store_hits,
+                "store_errors": self.store_errors,
+            }
@@ -0,0 +1,84 @@
+import json
+import sqlite3
+import threading
+import zlib
+
+
+class ForecastStore:
+    # Latest forecast per (lat, lon, units) in SQLite, as zlib-compressed JSON
+    # plus its fetch time. Each thread gets its own connection; WAL mode lets
+    # readers proceed while another thread writes.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.reads = 0
+        self.writes = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecasts (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    units TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (lat, lon, units)
+                )
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(value):
+        return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def _decode(payload):
+        return json.loads(zlib.decompress(payload))
+
+    def after_fork(self):
+        # Drop connections inherited from the parent without closing them
+        self._local = threading.local()
+
+    def put(self, key, fetched_at, value):
+        lat, lon, units = key
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?)",
+                         (lat, lon, units, fetched_at, self._encode(value)))
+        self.writes += 1
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT fetched_at, payload FROM forecasts WHERE lat = ? AND lon = ? AND units = ?",
+            key).fetchone()
+        self.reads += 1
+        if row is None:
+            return None
+        return row[0], self._decode(row[1])
+
+    def load_all(self, limit=None):
+        # Most recent first, so hydrating a bounded cache keeps the newest
+        query = "SELECT lat, lon, units, fetched_at, payload FROM forecasts ORDER BY fetched_at DESC"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        for lat, lon, units, fetched_at, payload in self._connect().execute(query, params):
+            yield (lat, lon, units), fetched_at, self._decode(payload)
+
+    def fetched_times(self):
+        # (key, fetched_at) of every stored forecast, without the payloads
+        for lat, lon, units, fetched_at in self._connect().execute(
+                "SELECT lat, lon, units, fetched_at FROM forecasts"):
+            yield (lat, lon, units), fetched_at
+
+    def stats(self):
+        count = self._connect().execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+        return {"path": self.path, "entries": count, "reads": self.reads, "writes": self.writes}
@@ -0,0 +1,42 @@
+# Production server settings: gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+import tempfile
+
+port = os.environ.get("PORT", "5000")
+bind = f"0.0.0.0:{port}"
+
+# Workers share forecasts and the rendered dashboard through memory-mapped
+# files here, so only one of them talks to OpenWeatherMap and renders
+os.environ.setdefault("SHARED_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"climbing-cache-{port}"))
+
+# Import app (matplotlib, fonts, the location registry, the forecast store) once in the
+# master and fork workers from it, sharing those pages copy-on-write.
+preload_app = True
+
+# Rendering is CPU-bound, so one worker process per core; a few threads per
+# worker cover the time spent waiting on OpenWeatherMap.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# A cold render of the full dashboard can take several seconds
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound matplotlib cache growth
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = "-"
+
+
+def when_ready(server):
+    import app
+    app.warm_up()
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+# No 429: retrying a throttled call only spends more of the quota
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_retry_charge = None
+
+
+class ChargedRetry(Retry):
+    # Every retry is another upstream request, so each one must first get
+    # charge() to return True (e.g. take a rate-limit token); otherwise the
+    # retries stop and the last response or error is returned.
+
+    def __init__(self, *args, charge=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.charge = charge
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.charge = self.charge
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if self.charge is not None and not self.charge():
+            raise MaxRetryError(_pool, url, error or ResponseError("no quota left to retry"))
+        return retry
+
+
+def charge_retries(charge):
+    # Route future sessions' retries through charge(); takes effect on the
+    # next get_session()
+    global _retry_charge
+    _retry_charge = charge
+    reset_session()
+
+
+def build_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, charge=None):
+    retry = ChargedRetry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        charge=charge,
+    )
+    # pool_maxsize is the number of keep-alive sockets kept per host; requests
+    # beyond it still go through but their sockets are closed afterwards.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(charge=_retry_charge)
+    return _session
+
+
+def reset_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def pool_stats(session=None):
+    session = session or _session
+    stats = {"requests": 0, "new_connections": 0, "open_connections": 0,
+             "idle_connections": 0, "hosts": 0}
+    if session is not None:
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None or pool.pool is None:
+                    continue
+                queued = list(pool.pool.queue)
+                idle = sum(1 for conn in queued if conn is not None and conn.sock is not None)
+                # The queue is pre-filled with maxsize placeholders, so anything
+                # missing from it is a connection currently checked out.
+                in_use = max(0, pool.pool.maxsize - len(queued))
+                stats["hosts"] += 1
+                stats["requests"] += pool.num_requests
+                stats["new_connections"] += pool.num_connections
+                stats["idle_connections"] += idle
+                stats["open_connections"] += idle + in_use
+    reused = max(0, stats["requests"] - stats["new_connections"])
+    stats["reused_connections"] = reused
+    stats["reuse_rate"] = round(reused / stats["requests"], 4) if stats["requests"] else 0.0
+    return stats
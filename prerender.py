@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from singleflight import SingleFlight
+
+Artifact = namedtuple("Artifact", ["png", "etag", "rendered_at", "duration"])
+
+
+def make_artifact(png, rendered_at, duration):
+    return Artifact(png, hashlib.sha256(png).hexdigest()[:20], rendered_at, duration)
+
+
+def next_aligned_run(now, interval, offset=0):
+    # Next wall-clock time of the form k * interval + offset (UTC epoch based),
+    # e.g. 00:10, 03:10, 06:10 ... for a 3 hour interval and 10 minute offset.
+    k = int((now - offset) // interval) + 1
+    return k * interval + offset
+
+
+class PrerenderScheduler:
+    # Renders on start and then on an aligned fixed cadence in a daemon thread.
+    # The latest successful render is swapped in as a single immutable tuple,
+    # so readers always see a complete artifact.
+
+    def __init__(self, render, interval, offset=0, retry_delay=300, clock=time.time, on_render=None):
+        self.render = render
+        self.on_render = on_render
+        self.interval = interval
+        self.offset = offset
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.artifact = None
+        self.renders = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_attempt = None
+        self.next_run = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prerender", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self):
+        return self.artifact
+
+    def run_once(self, render=None):
+        # Callers arriving while a render runs get its artifact; only the
+        # render that actually executed is counted and published
+        return self._flight.do("render", self._run, render or self.render)
+
+    def _run(self, render):
+        started = self.clock()
+        self.last_attempt = started
+        t0 = time.perf_counter()
+        try:
+            png = render()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        if png is None:
+            self.failures += 1
+            self.last_error = "no data available"
+            return self.artifact
+        self.artifact = make_artifact(png, started, time.perf_counter() - t0)
+        self.renders += 1
+        self.last_error = None
+        if self.on_render is not None:
+            self.on_render(self.artifact)
+        return self.artifact
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ok = self.run_once() is not None
+            except Exception as e:
+                print(f"Dashboard pre-render failed: {e}")
+                ok = False
+            now = self.clock()
+            self.next_run = next_aligned_run(now, self.interval, self.offset)
+            if not ok:
+                self.next_run = min(self.next_run, now + self.retry_delay)
+            self._stop.wait(max(0, self.next_run - now))
+
+    def stats(self):
+        def iso(ts):
+            return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+        artifact = self.artifact
+        return {
+            "running": self.running,
+            "renders": self.renders,
+            "failures": self.failures,
+            "last_success": iso(artifact.rendered_at) if artifact else None,
+            "last_render_seconds": round(artifact.duration, 3) if artifact else None,
+            "etag": artifact.etag if artifact else None,
+            "last_attempt": iso(self.last_attempt),
+            "last_error": self.last_error,
+            "next_run": iso(self.next_run),
+            "interval": self.interval,
+        }
@@ -0,0 +1,252 @@
+import fcntl
+import heapq
+import math
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+# (tokens, updated) for the minute and day buckets, then granted, rejected
+_STATE = struct.Struct("<4dQQ")
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n=1):
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+
+class RateLimiter:
+    # A call must take a token from every bucket, e.g. one sized for the
+    # per-minute quota and one refilling at the per-day quota spread evenly.
+    # With a state_path the buckets live in that file instead, updated under
+    # an flock, so every process on the host (and its replacements after a
+    # restart) draws from one quota. File state is timed by the wall clock.
+
+    def __init__(self, per_minute, per_day, clock=None, state_path=None):
+        clock = clock or (time.time if state_path else time.monotonic)
+        self.buckets = [
+            TokenBucket(per_minute / 60.0, per_minute, clock),
+            TokenBucket(per_day / 86400.0, min(per_minute, per_day), clock),
+        ]
+        self.clock = clock
+        self.state_path = state_path
+        self._fd = None
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+
+    def after_fork(self):
+        # flock belongs to the open file, which a forked child would share
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            if self.state_path is None:
+                yield
+                return
+            if self._fd is None:
+                self._fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(self._fd, _STATE.size, 0)
+                if len(data) == _STATE.size:
+                    minute, day = self.buckets
+                    (minute.tokens, minute.updated, day.tokens, day.updated,
+                     self.granted, self.rejected) = _STATE.unpack(data)
+                yield
+                minute, day = self.buckets
+                os.pwrite(self._fd, _STATE.pack(minute.tokens, minute.updated, day.tokens, day.updated,
+                                                self.granted, self.rejected), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def available(self):
+        with self._state():
+            for bucket in self.buckets:
+                bucket.refill()
+            return min(bucket.tokens for bucket in self.buckets)
+
+    def try_acquire(self):
+        with self._state():
+            for bucket in self.buckets:
+                bucket.refill()
+            if all(bucket.tokens >= 1 for bucket in self.buckets):
+                for bucket in self.buckets:
+                    bucket.tokens -= 1
+                self.granted += 1
+                return True
+            return False
+
+    def acquire(self, timeout=0.0):
+        deadline = self.clock() + timeout
+        while True:
+            if self.try_acquire():
+                return
+            with self._state():
+                wait = max(bucket.wait_time() for bucket in self.buckets)
+                rejected = self.clock() + wait > deadline
+                if rejected:
+                    self.rejected += 1
+            if rejected:
+                raise RateLimitedError("upstream call quota exhausted")
+            time.sleep(wait)
+
+    def stats(self):
+        minute, day = self.buckets
+        return {
+            "available": round(self.available(), 2),
+            "shared": self.state_path is not None,
+            "per_minute": minute.capacity,
+            "per_day": round(day.rate * 86400),
+            "granted": self.granted,
+            "rejected": self.rejected,
+        }
+
+
+class RefreshScheduler:
+    # Spends spare quota refreshing forecasts before they go stale. Each tick
+    # ranks keys older than min_age: ones requests missed first, then recently
+    # viewed ones, each group by age weighted by views, and refreshes the top
+    # ones while the limiter has more than `reserve` tokens, leaving the
+    # reserve for cache misses on the request path. With shared_counts (a
+    # SharedCounters) views and misses from every process go through it, and
+    # the process running the scheduler drains them each tick.
+
+    def __init__(self, keys, age, refresh, limiter, min_age, reserve=5, tick=2.0,
+                 view_half_life=3600.0, max_age=None, shared_counts=None, clock=time.monotonic):
+        self.keys = keys
+        self.age = age
+        self.refresh = refresh
+        self.limiter = limiter
+        self.min_age = min_age
+        self.max_age = 2 * min_age if max_age is None else max_age
+        self.reserve = reserve
+        self.tick = tick
+        self.view_half_life = view_half_life
+        self.shared_counts = shared_counts
+        self.clock = clock
+        self._views = {}
+        self._misses = {}
+        self._views_decayed_at = clock()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+        self.errors = 0
+        self.backlog = 0
+
+    def record_view(self, key):
+        self._record("view", key)
+
+    def record_miss(self, key):
+        # A request wanted this key and found nothing fresh
+        self._record("miss", key)
+
+    def _record(self, kind, key):
+        if self.shared_counts is not None:
+            self.shared_counts.add((kind, key))
+            return
+        counts = self._views if kind == "view" else self._misses
+        with self._lock:
+            counts[key] = counts.get(key, 0.0) + 1.0
+
+    def _collect(self):
+        if self.shared_counts is None:
+            return
+        for (kind, key), n in self.shared_counts.drain().items():
+            counts = self._views if kind == "view" else self._misses
+            with self._lock:
+                counts[key] = counts.get(key, 0.0) + n
+
+    def _decay_views(self):
+        now = self.clock()
+        factor = 0.5 ** ((now - self._views_decayed_at) / self.view_half_life)
+        self._views_decayed_at = now
+        with self._lock:
+            self._views = {k: v * factor for k, v in self._views.items() if v * factor > 0.01}
+            self._misses = {k: v * factor for k, v in self._misses.items() if v * factor > 0.01}
+
+    def priority(self, key, age):
+        # Lower sorts first. Ages are capped at max_age, so a never-fetched key
+        # (infinite age) ranks as merely very stale rather than above all else.
+        views = self._views.get(key, 0.0) + self._misses.get(key, 0.0)
+        group = 0 if key in self._misses else 1 if views > 0 else 2
+        return (group, -min(age, self.max_age) * (1.0 + math.log1p(views)))
+
+    def due(self):
+        ranked = []
+        for key in self.keys():
+            age = self.age(key)
+            if age >= self.min_age:
+                ranked.append((self.priority(key, age), key))
+        heapq.heapify(ranked)
+        return ranked
+
+    def run_once(self):
+        self._collect()
+        self._decay_views()
+        ranked = self.due()
+        while ranked and self.limiter.available() >= self.reserve + 1:
+            _, key = heapq.heappop(ranked)
+            try:
+                self.refresh(key)
+                self.refreshes += 1
+                with self._lock:
+                    self._misses.pop(key, None)
+            except Exception as e:
+                self.errors += 1
+                print(f"Scheduled refresh failed for {key}: {e}")
+        self.backlog = len(ranked)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Refresh scheduler tick failed: {e}")
+            self._stop.wait(self.tick)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "backlog": self.backlog,
+            "tracked_views": len(self._views),
+            "missed": len(self._misses),
+            "shared": self.shared_counts.stats() if self.shared_counts is not None else None,
+        }
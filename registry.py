@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+import re
+import threading
+from collections import namedtuple
+
+Location = namedtuple("Location", ["id", "name", "lat", "lon", "regions"])
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def _split_regions(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(str(v).strip() for v in value if str(v).strip())
+    return tuple(part.strip() for part in (value or "").split(";") if part.strip())
+
+
+class LocationRegistry:
+    # Crags loaded from a CSV (id,name,lat,lon,region) or JSON list of objects
+    # on first use. Ids come from the file, or from the name when absent, and
+    # region may hold several tags separated by ";".
+
+    def __init__(self, path):
+        self.path = path
+        self._locations = None
+        self._by_region = None
+        self._lock = threading.Lock()
+
+    def _read_rows(self):
+        if self.path.endswith(".json"):
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def load(self):
+        if self._locations is not None:
+            return self._locations
+        with self._lock:
+            if self._locations is None:
+                locations = {}
+                by_region = {}
+                for row in self._read_rows():
+                    loc_id = str(row.get("id") or slugify(row["name"]))
+                    if loc_id in locations:
+                        raise ValueError(f"{self.path}: duplicate location id {loc_id!r}")
+                    loc = Location(loc_id, row["name"], float(row["lat"]), float(row["lon"]),
+                                   _split_regions(row.get("region", row.get("regions"))))
+                    locations[loc_id] = loc
+                    for region in loc.regions:
+                        by_region.setdefault(region.lower(), []).append(loc_id)
+                self._by_region = by_region
+                self._locations = locations
+        return self._locations
+
+    def __len__(self):
+        return len(self.load())
+
+    def get(self, loc_id):
+        return self.load().get(loc_id)
+
+    def regions(self):
+        self.load()
+        return sorted(self._by_region)
+
+    def select(self, ids=None, regions=None):
+        # {id: {"name", "lat", "lon", "regions"}} in registry order; no
+        # filters selects everything
+        locations = self.load()
+        if ids is None and regions is None:
+            chosen = locations
+        else:
+            wanted = set(ids or ())
+            for region in regions or ():
+                wanted.update(self._by_region.get(region.lower(), ()))
+            chosen = [loc_id for loc_id in locations if loc_id in wanted]
+        return {loc_id: {"name": locations[loc_id].name, "lat": locations[loc_id].lat,
+                         "lon": locations[loc_id].lon, "regions": locations[loc_id].regions}
+                for loc_id in chosen}
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locations.csv")
@@ -0,0 +1,285 @@
+import fcntl
+import heapq
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+# magic, sequence number, payload length, payload crc32
+_HEADER = struct.Struct("<8sQQI4x")
+_MAGIC = b"CLMBSHM1"
+# length of each pickled batch appended to a SharedCounters file
+_BATCH = struct.Struct("<I")
+
+
+class SharedCacheMiss(LookupError):
+    pass
+
+
+class WriterLock:
+    # Exclusive, non-blocking flock on a file: at most one process holds it,
+    # and the kernel releases it if that process dies.
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        with self._lock:
+            if self._fd is not None:
+                return True
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            return True
+
+    def after_fork(self):
+        # flock locks belong to the open file, which a forked child shares;
+        # forget it without unlocking so the parent keeps ownership
+        self._fd = None
+        self._lock = threading.Lock()
+
+
+class SharedSlot:
+    # One pickled object in a memory-mapped file, shared by every process that
+    # opens the same path. A single writer publishes with a seqlock: the
+    # sequence number is odd while a write is in progress, and readers retry
+    # until they copy a payload under an unchanged even sequence whose crc32
+    # matches. Readers keep the last decoded object until the sequence moves.
+
+    def __init__(self, path, capacity=1 << 20):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, "r+b")
+        if os.fstat(fd).st_size < _HEADER.size + capacity:
+            os.ftruncate(fd, _HEADER.size + capacity)
+        self._map = mmap.mmap(fd, 0)
+        self._lock = threading.Lock()
+        self._seen_seq = None
+        self._seen_value = None
+        self.reads = 0
+        self.retries = 0
+        self.writes = 0
+
+    def _remap(self):
+        self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def write(self, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            needed = _HEADER.size + len(payload)
+            if os.fstat(self._file.fileno()).st_size < needed:
+                os.ftruncate(self._file.fileno(), needed)
+            if len(self._map) < needed:
+                self._remap()
+            magic, seq, _, _ = _HEADER.unpack_from(self._map)
+            seq = seq if magic == _MAGIC else 0
+            seq += seq % 2  # recover from a writer that died mid-write
+            _HEADER.pack_into(self._map, 0, _MAGIC, seq + 1, 0, 0)
+            self._map[_HEADER.size:needed] = payload
+            _HEADER.pack_into(self._map, 0, _MAGIC, seq + 2, len(payload), zlib.crc32(payload))
+            self.writes += 1
+
+    def read(self, attempts=100):
+        with self._lock:
+            for _ in range(attempts):
+                magic, seq, length, crc = _HEADER.unpack_from(self._map)
+                if magic != _MAGIC or length == 0:
+                    return None
+                if seq % 2:
+                    self.retries += 1
+                    time.sleep(0)
+                    continue
+                if seq == self._seen_seq:
+                    return self._seen_value
+                if len(self._map) < _HEADER.size + length:
+                    self._remap()
+                payload = self._map[_HEADER.size:_HEADER.size + length]
+                if _HEADER.unpack_from(self._map)[1] != seq or zlib.crc32(payload) != crc:
+                    self.retries += 1
+                    continue
+                self._seen_seq, self._seen_value = seq, pickle.loads(payload)
+                self.reads += 1
+                return self._seen_value
+            return self._seen_value
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+            self._file.close()
+
+    def stats(self):
+        magic, seq, length, _ = _HEADER.unpack_from(self._map)
+        return {
+            "path": self.path,
+            "sequence": seq if magic == _MAGIC else 0,
+            "bytes": length if magic == _MAGIC else 0,
+            "mapped_bytes": len(self._map),
+            "reads": self.reads,
+            "retries": self.retries,
+            "writes": self.writes,
+        }
+
+
+class SharedForecasts:
+    # {key: (fetched_at, value)} published through SharedSlots, one per shard
+    # so a put republishes and a reader decodes only that key's shard. Each
+    # shard keeps its newest max_entries / len(slots) entries. The writer
+    # batches puts and republishes at most once per flush_interval.
+
+    def __init__(self, slots, max_entries=4096, flush_interval=1.0):
+        self.slots = slots
+        self.shard_entries = max(1, -(-max_entries // len(slots)))
+        self.flush_interval = flush_interval
+        self._pending = {}  # shard index -> full shard dict to publish
+        self._lock = threading.Lock()
+        self._flush_timer = None
+        self.evictions = 0
+
+    def _shard(self, key):
+        # crc32 rather than hash(): str hashes differ between processes
+        return zlib.crc32(repr(key).encode()) % len(self.slots)
+
+    def get(self, key):
+        snapshot = self.slots[self._shard(key)].read() or {}
+        return snapshot.get(key)
+
+    def put(self, key, fetched_at, value):
+        index = self._shard(key)
+        with self._lock:
+            shard = self._pending.get(index)
+            if shard is None:
+                shard = self._pending[index] = dict(self.slots[index].read() or {})
+            shard[key] = (fetched_at, value)
+            excess = len(shard) - self.shard_entries
+            if excess > 0:
+                for old in heapq.nsmallest(excess, shard, key=lambda k: shard[k][0]):
+                    del shard[old]
+                self.evictions += excess
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        # Publish under the lock, so a put never starts a shard from a
+        # snapshot older than the one being written
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_timer = None
+            for index, shard in pending.items():
+                self.slots[index].write(shard)
+
+    def stats(self):
+        slots = [slot.stats() for slot in self.slots]
+        return {
+            "shards": len(slots),
+            "shard_entries": self.shard_entries,
+            "evictions": self.evictions,
+            "bytes": sum(s["bytes"] for s in slots),
+            "mapped_bytes": sum(s["mapped_bytes"] for s in slots),
+            "reads": sum(s["reads"] for s in slots),
+            "retries": sum(s["retries"] for s in slots),
+            "writes": sum(s["writes"] for s in slots),
+        }
+
+
+class SharedCounters:
+    # Counts added by any number of processes and drained by one consumer.
+    # Each process batches its adds and appends them to one file under an
+    # flock at most once per flush_interval; drain() sums and truncates it.
+    # Appends stop while the file is over max_bytes, e.g. with no consumer.
+
+    def __init__(self, path, flush_interval=1.0, max_bytes=4 << 20):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._fd = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_timer = None
+        self.dropped = 0
+
+    def _file(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        return self._fd
+
+    def after_fork(self):
+        # flock belongs to the open file, which a forked child would share
+        self._fd = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_timer = None
+
+    def add(self, key, n=1.0):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0.0) + n
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_timer = None
+            if not pending:
+                return
+            payload = pickle.dumps(pending, protocol=pickle.HIGHEST_PROTOCOL)
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size + _BATCH.size + len(payload) > self.max_bytes:
+                    self.dropped += len(pending)
+                    return
+                os.write(fd, _BATCH.pack(len(payload)) + payload)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def drain(self):
+        # {key: total} of everything added since the last drain, this
+        # process's pending adds included
+        self.flush()
+        with self._lock:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(fd, os.fstat(fd).st_size, 0)
+                os.ftruncate(fd, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        totals = {}
+        offset = 0
+        while offset + _BATCH.size <= len(data):
+            (length,) = _BATCH.unpack_from(data, offset)
+            offset += _BATCH.size
+            try:
+                batch = pickle.loads(data[offset:offset + length])
+            except Exception:
+                break  # torn by a process killed mid-append
+            offset += length
+            for key, n in batch.items():
+                totals[key] = totals.get(key, 0.0) + n
+        return totals
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "pending": len(self._pending),
+                "dropped": self.dropped,
+            }
@@ -0,0 +1,80 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    # Points bucketed into cell_deg x cell_deg lat/lon cells. A radius query
+    # visits only the cells overlapping the circle's bounding box, clipped to
+    # the poles and wrapped at the antimeridian, and checks exact haversine
+    # distance over each cell's arrays. Boxes with more cells than the index
+    # holds scan the occupied cells instead, so no query costs more than a
+    # pass over the index.
+
+    def __init__(self, points, cell_deg=0.5):
+        self.cell_deg = cell_deg
+        self._col_min = int(math.floor(-180.0 / cell_deg))
+        self._ncols = int(math.ceil(360.0 / cell_deg))
+        buckets = defaultdict(list)
+        for point_id, lat, lon in points:
+            buckets[self._cell(lat, lon)].append((point_id, lat, lon))
+        self._cells = {}
+        for cell, rows in buckets.items():
+            ids, lats, lons = zip(*rows)
+            self._cells[cell] = (list(ids), np.array(lats), np.array(lons))
+        self.size = sum(len(rows) for rows in buckets.values())
+
+    def _row(self, lat):
+        return int(math.floor(lat / self.cell_deg))
+
+    def _col(self, lon):
+        # Longitudes normalised to [-180, 180), so 180 and -180 share a column
+        return int(math.floor(((lon + 180.0) % 360.0 - 180.0) / self.cell_deg))
+
+    def _cell(self, lat, lon):
+        return self._row(lat), self._col(lon)
+
+    def _columns(self, lon, dlon):
+        if dlon >= 180.0:
+            return list(range(self._col_min, self._col_min + self._ncols))
+        first = int(math.floor((lon - dlon) / self.cell_deg))
+        last = int(math.floor((lon + dlon) / self.cell_deg))
+        wrapped = ((j - self._col_min) % self._ncols + self._col_min for j in range(first, last + 1))
+        return list(dict.fromkeys(wrapped))
+
+    def query(self, lat, lon, radius_km):
+        # [(distance_km, id)] for every point within radius_km, unordered
+        if not (math.isfinite(lat) and math.isfinite(lon) and math.isfinite(radius_km)):
+            raise ValueError("lat, lon and radius_km must be finite")
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        if abs(lat) + dlat >= 89.0:
+            dlon = 180.0  # the circle reaches (or nearly reaches) a pole
+        else:
+            dlon = min(180.0, dlat / math.cos(math.radians(abs(lat) + dlat)))
+        rows = range(max(self._row(lat - dlat), self._row(-90.0)), min(self._row(lat + dlat), self._row(90.0)) + 1)
+        cols = self._columns(lon, dlon)
+        if len(rows) * len(cols) > len(self._cells):
+            wanted = set(cols)
+            cells = [cell for (i, j), cell in self._cells.items() if i in rows and j in wanted]
+        else:
+            cells = [self._cells.get((i, j)) for i in rows for j in cols]
+        found = []
+        for cell in cells:
+            if cell is None:
+                continue
+            ids, lats, lons = cell
+            dist = haversine_km(lat, lon, lats, lons)
+            for k in np.flatnonzero(dist <= radius_km):
+                found.append((float(dist[k]), ids[k]))
+        return found
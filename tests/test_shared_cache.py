@@ -0,0 +1,139 @@
+# Two-process checks of the flock writer election and the seqlock slots.
+# Run from the repository root: python -m unittest discover tests
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from shared_cache import _HEADER, _MAGIC, SharedCounters, SharedForecasts, SharedSlot, WriterLock
+
+ctx = multiprocessing.get_context("fork")
+
+
+def _hold_lock(path, acquired, release):
+    lock = WriterLock(path)
+    acquired.put(lock.try_acquire())
+    release.wait(10)
+
+
+def _write_values(path, count):
+    slot = SharedSlot(path, capacity=1024)
+    for i in range(count):
+        # Sizes vary so some writes grow the file and force readers to remap
+        slot.write((i, bytes([i % 256]) * (1000 + (i * 7919) % 200_000)))
+
+
+def _publish_forecasts(directory, shards, max_entries, count):
+    forecasts = SharedForecasts(_slots(directory, shards), max_entries=max_entries, flush_interval=60)
+    for i in range(count):
+        forecasts.put((42.0, -72.0 + i, "metric"), 1000 + i, {"i": i})
+    forecasts.flush()
+
+
+def _add_counts(path, count):
+    counters = SharedCounters(path, flush_interval=0.01)
+    for i in range(count):
+        counters.add(("view", i % 10))
+    counters.flush()
+
+
+def _slots(directory, shards):
+    return [SharedSlot(os.path.join(directory, f"forecasts-{i:02d}.mmap"), 4096) for i in range(shards)]
+
+
+class WriterLockTest(unittest.TestCase):
+    def test_one_writer_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "writer.lock")
+            acquired, release = ctx.Queue(), ctx.Event()
+            holder = ctx.Process(target=_hold_lock, args=(path, acquired, release))
+            holder.start()
+            self.assertTrue(acquired.get(timeout=10))
+            self.assertFalse(WriterLock(path).try_acquire())
+            release.set()
+            holder.join(10)
+            # The kernel drops the lock with the holder's file descriptor
+            lock = WriterLock(path)
+            self.assertTrue(lock.try_acquire())
+            self.assertTrue(lock.held)
+
+
+class SharedSlotTest(unittest.TestCase):
+    def test_reader_never_sees_a_torn_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "slot.mmap")
+            reader = SharedSlot(path, capacity=1024)
+            self.addCleanup(reader.close)
+            writer = ctx.Process(target=_write_values, args=(path, 2000))
+            writer.start()
+            last = -1
+            while writer.is_alive() or last < 1999:
+                value = reader.read()
+                if value is None:
+                    continue
+                i, payload = value
+                self.assertGreaterEqual(i, last)
+                self.assertEqual(payload, bytes([i % 256]) * len(payload))
+                last = i
+            writer.join(10)
+            self.assertEqual(writer.exitcode, 0)
+            self.assertGreater(reader.stats()["reads"], 1)
+
+    def test_recovers_from_a_writer_that_died_mid_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "slot.mmap")
+            first, reader, second = SharedSlot(path), SharedSlot(path), SharedSlot(path)
+            for slot in (first, reader, second):
+                self.addCleanup(slot.close)
+            first.write("before")
+            self.assertEqual(reader.read(), "before")
+            # Leave the sequence odd, as a writer killed between its two
+            # header updates would
+            _, seq, length, crc = _HEADER.unpack_from(first._map)
+            _HEADER.pack_into(first._map, 0, _MAGIC, seq + 1, length, crc)
+            self.assertEqual(reader.read(attempts=5), "before")
+            second.write("after")
+            self.assertEqual(reader.read(), "after")
+
+
+class SharedForecastsTest(unittest.TestCase):
+    def test_reader_sees_writer_puts_and_shards_stay_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = ctx.Process(target=_publish_forecasts, args=(tmp, 4, 40, 100))
+            writer.start()
+            writer.join(10)
+            self.assertEqual(writer.exitcode, 0)
+            reader = SharedForecasts(_slots(tmp, 4), max_entries=40)
+            for slot in reader.slots:
+                self.addCleanup(slot.close)
+            present = [i for i in range(100) if reader.get((42.0, -72.0 + i, "metric")) is not None]
+            self.assertLessEqual(len(present), 40)
+            # Eviction drops the oldest fetches first
+            self.assertEqual(reader.get((42.0, 27.0, "metric")), (1099, {"i": 99}))
+            self.assertNotIn(0, present)
+
+
+class SharedCountersTest(unittest.TestCase):
+    def test_drain_sums_adds_from_every_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "counts")
+            consumer = SharedCounters(path, flush_interval=60)
+            consumer.add(("miss", 3))
+            workers = [ctx.Process(target=_add_counts, args=(path, 500)) for _ in range(3)]
+            for worker in workers:
+                worker.start()
+            totals = {}
+            while any(worker.is_alive() for worker in workers):
+                for key, n in consumer.drain().items():
+                    totals[key] = totals.get(key, 0.0) + n
+            for worker in workers:
+                worker.join(10)
+                self.assertEqual(worker.exitcode, 0)
+            for key, n in consumer.drain().items():
+                totals[key] = totals.get(key, 0.0) + n
+            self.assertEqual(totals, {("miss", 3): 1.0, **{("view", i): 150.0 for i in range(10)}})
+            self.assertEqual(consumer.drain(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()